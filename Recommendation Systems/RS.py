@@ -1,140 +1,1676 @@
 
 import numpy as np
 import pandas as pd
-from sklearn.preprocessing import OneHotEncoder, MinMaxScaler
+from sklearn.preprocessing import OneHotEncoder, MinMaxScaler, normalize
 from sklearn.metrics.pairwise import cosine_similarity
-import tkinter as tk
-from tkinter import messagebox, simpledialog
+try:
+    import tkinter as tk
+    from tkinter import messagebox, simpledialog, ttk
+except ImportError:  # Headless installs can still run the server and the offline tools
+    tk = None
+import argparse
+import asyncio
+import atexit
+import bisect
+import contextlib
+import copy
 import csv
+import functools
+import heapq
+import json
+import os
+import sqlite3
+import struct
+import sys
+import threading
+import time
+import zlib
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from http import HTTPStatus
+from itertools import islice
+from urllib.parse import parse_qs, urlsplit
+from scipy.sparse import csr_matrix
 from scipy.spatial.distance import cosine
 
-class MovieRecommendationSystem:
-    def __init__(self):
-        self.movies = {}
-        self.user_data = {}
-        self.user_ratings = {}
-        self.logged_in_user = None
-        self.similarity_matrix = None
 
-    def load_movie_data(self, file_path):
-        with open(file_path, 'r') as file:
-            next(file)  # Skip header
-            for line in file:
-                data = line.strip().split(',')
-                if data[0]:  # Check if the first element is not empty
-                    movie_id = int(data[0])
-                    movie_info = {
-                        "id": data[0],
-                        "title": data[1],
-                        "genre": data[2],
-                        "view": int(data[4]),
-                        "rating": float(data[5])
-                    }
-                    self.movies[movie_id] = movie_info
-
-    def load_user_data(self, file_path):
-        with open(file_path, 'r') as file:
-            next(file)  # Skip header
-            for line in file:
-                data = line.strip().split(',')
-                if data[0]:  # Check if the first element is not empty
-                    try:
-                        user_id = int(data[0])
-                        name = data[1]
-                        password = data[2]
-                        age = int(data[3])
-                        gender = data[4]
-                        self.user_data[user_id] = {
-                            'name': name,
-                            'password': password,
-                            'age': age,
-                            'gender': gender,
-                            'ratings': []  # Initialize an empty list for user ratings
-                        }
-                    except ValueError as e:
-                        print(f"Skipping line due to error: {e}")
+def _read_csv_chunks(file_path, chunk_size, progress=None, **read_options):
+    # pandas chunks of at most chunk_size rows; progress(rows_read) is called after each one
+    rows_read = 0
+    for chunk in pd.read_csv(file_path, chunksize=chunk_size, **read_options):
+        yield chunk
+        rows_read += len(chunk)
+        if progress is not None:
+            progress(rows_read)
+
+
+def _top_k_indices(scores, k):
+    # Indices of the k largest scores, highest first. Ties keep the lower index first,
+    # which matches a stable sort over the original ordering.
+    scores = np.asarray(scores)
+    if k <= 0 or scores.size == 0:
+        return np.empty(0, dtype=np.int64)
+    if k < scores.size:
+        threshold = np.partition(scores, scores.size - k)[scores.size - k]
+        candidates = np.flatnonzero(scores >= threshold)
+    else:
+        candidates = np.arange(scores.size)
+    order = np.argsort(-scores[candidates], kind='stable')
+    return candidates[order[:k]]
+
+
+ARTIFACT_MAGIC = b'RSARTIFACT'
+ARTIFACT_VERSION = 1
+ARTIFACT_ALIGNMENT = 64
+
+
+def _align(offset):
+    return (offset + ARTIFACT_ALIGNMENT - 1) // ARTIFACT_ALIGNMENT * ARTIFACT_ALIGNMENT
+
+
+@contextlib.contextmanager
+def create_artifact(file_path, kind, specs, meta=None):
+    # Binary container: magic, format version, header length, JSON header describing each
+    # array (dtype, shape, offset), then the arrays as contiguous, 64-byte aligned blocks.
+    # specs maps array name -> (dtype, shape). Yields writable memmaps to fill in place.
+    # They map a temporary file that replaces file_path atomically once the block exits, so
+    # processes that still map the old artifact keep reading it intact.
+    arrays, offset = {}, 0
+    for name, (dtype, shape) in specs.items():
+        dtype = np.dtype(dtype)
+        shape = tuple(int(size) for size in shape)
+        arrays[name] = {'dtype': dtype.str, 'shape': shape, 'offset': offset}
+        offset = _align(offset + dtype.itemsize * int(np.prod(shape)))
+    header = json.dumps({'kind': kind, 'meta': meta or {}, 'arrays': arrays}).encode('utf-8')
+    prefix = ARTIFACT_MAGIC + struct.pack('<IQ', ARTIFACT_VERSION, len(header))
+    data_start = _align(len(prefix) + len(header))
+
+    temporary = f"{file_path}.{os.getpid()}.tmp"
+    with open(temporary, 'wb') as file:
+        file.write(prefix + header)
+        file.truncate(data_start + max(offset, 1))
+
+    try:
+        targets = {name: np.memmap(temporary, dtype=np.dtype(spec['dtype']), mode='r+',
+                                   offset=data_start + spec['offset'], shape=spec['shape'])
+                   for name, spec in arrays.items()}
+        yield targets
+        for target in targets.values():
+            target.flush()
+        os.replace(temporary, file_path)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+
+
+def write_artifact(file_path, kind, arrays, meta=None):
+    with create_artifact(file_path, kind, {name: (array.dtype, array.shape) for name, array in arrays.items()},
+                         meta) as targets:
+        for name, array in arrays.items():
+            targets[name][...] = array
+
+
+def is_artifact(file_path):
+    with open(file_path, 'rb') as file:
+        return file.read(len(ARTIFACT_MAGIC)) == ARTIFACT_MAGIC
+
+
+def open_artifact(file_path, kind=None, mode='r'):
+    # Maps every array of the artifact without reading it; pages are loaded on first access
+    # and shared through the page cache between processes that open the same file.
+    with open(file_path, 'rb') as file:
+        prefix = file.read(len(ARTIFACT_MAGIC) + struct.calcsize('<IQ'))
+        if not prefix.startswith(ARTIFACT_MAGIC):
+            raise ValueError(f"{file_path} is not a recommendation artifact.")
+        version, header_length = struct.unpack('<IQ', prefix[len(ARTIFACT_MAGIC):])
+        if version != ARTIFACT_VERSION:
+            raise ValueError(f"Unsupported artifact version {version} in {file_path}.")
+        header = json.loads(file.read(header_length).decode('utf-8'))
+    if kind is not None and header['kind'] != kind:
+        raise ValueError(f"{file_path} holds a '{header['kind']}' artifact, expected '{kind}'.")
+
+    data_start = _align(len(prefix) + header_length)
+    arrays = {}
+    for name, spec in header['arrays'].items():
+        dtype, shape = np.dtype(spec['dtype']), tuple(spec['shape'])
+        if 0 in shape:
+            arrays[name] = np.empty(shape, dtype=dtype)
+        else:
+            arrays[name] = np.memmap(file_path, dtype=dtype, mode=mode, offset=data_start + spec['offset'], shape=shape)
+    return header['meta'], arrays
+
+
+def _file_fingerprint(file_path):
+    # (size, mtime in ns) of a file, or None when it does not exist
+    try:
+        stat = os.stat(file_path)
+    except FileNotFoundError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def _database_fingerprint(file_path):
+    # (database id, change counter) of an SQLiteStorage database, or None without one. The file's
+    # size and mtime cannot be used: checkpoints rewrite it and closing removes the WAL file.
+    if not os.path.exists(file_path):
+        return None
+    connection = sqlite3.connect(file_path, timeout=30)
+    try:
+        values = dict(connection.execute("SELECT key, value FROM meta WHERE key IN ('database_id', 'changes')"))
+    except sqlite3.OperationalError:  # Not written by SQLiteStorage
+        return None
+    finally:
+        connection.close()
+    return [values.get('database_id'), values.get('changes')]
+
+
+def _source_fingerprint(name, file_path):
+    return _database_fingerprint(file_path) if name == 'database' else _file_fingerprint(file_path)
+
+
+def _pack_strings(values):
+    # Strings as one UTF-8 byte buffer plus offsets; much smaller than a fixed-width 'U' array
+    encoded = [str(value).encode('utf-8') for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+    return np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets
+
+
+def _unpack_strings(buffer, offsets):
+    data = bytes(buffer)
+    offsets = offsets.tolist()
+    return [data[start:end].decode('utf-8') for start, end in zip(offsets[:-1], offsets[1:])]
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _StageTimer:
+    __slots__ = ('metrics', 'stage', 'start')
+
+    def __init__(self, metrics, stage):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.metrics.record_stage(self.stage, time.perf_counter() - self.start)
+        return False
+
+
+class Metrics:
+    # Process-wide instrumentation: per-stage timers (calls, total and max seconds), counters and
+    # value summaries (count, sum, max). Disabled by default; every recording call then returns
+    # after one attribute check and timer() hands out a shared no-op context manager.
+    # Process pool workers keep their own metrics; the batch job merges them back per shard.
+    def __init__(self):
+        self.enabled = False
+        self.lock = threading.Lock()
+        self.stages = {}  # stage -> [calls, total seconds, max seconds]
+        self.counters = {}
+        self.values = {}  # name -> [count, sum, max]
+        self.exporter = None
+        self.profiler = None
+        self._stop_export = None
+        self._atexit_registered = False
+
+    def enable(self, exporter=None, export_interval=None, profile_interval=None, profile_file='profile.folded'):
+        # exporter: JsonLinesExporter / PrometheusExporter, written every export_interval seconds
+        # (if given) and on disable() or exit. profile_interval turns on the sampling profiler,
+        # whose stacks are written to profile_file in the collapsed flame graph format.
+        self.exporter = exporter
+        self.enabled = True
+        if export_interval and exporter is not None:
+            self._stop_export = threading.Event()
+            threading.Thread(target=self._export_periodically, args=(export_interval, self._stop_export),
+                             daemon=True).start()
+        if profile_interval:
+            self.profiler = SamplingProfiler(profile_interval, profile_file)
+            self.profiler.start()
+        if not self._atexit_registered:
+            atexit.register(self.disable)
+            self._atexit_registered = True
+
+    def disable(self):
+        if not self.enabled:
+            return
+        self.enabled = False
+        if self._stop_export is not None:
+            self._stop_export.set()
+            self._stop_export = None
+        if self.profiler is not None:
+            self.profiler.stop()
+            self.profiler = None
+        self.export()
+
+    def _export_periodically(self, interval, stop):
+        while not stop.wait(interval):
+            self.export()
+
+    def reset(self):
+        with self.lock:
+            self.stages.clear()
+            self.counters.clear()
+            self.values.clear()
+
+    def collect(self):
+        # Returns the raw measurements recorded since the last collect() and starts over
+        with self.lock:
+            raw = {'stages': self.stages, 'counters': self.counters, 'values': self.values}
+            self.stages, self.counters, self.values = {}, {}, {}
+            return raw
+
+    def merge(self, raw):
+        # Adds measurements returned by another process's collect()
+        with self.lock:
+            for target, source in ((self.stages, raw['stages']), (self.values, raw['values'])):
+                for name, (count, total, largest) in source.items():
+                    entry = target.setdefault(name, [0, 0, largest])
+                    entry[0] += count
+                    entry[1] += total
+                    entry[2] = max(entry[2], largest)
+            for name, value in raw['counters'].items():
+                self.counters[name] = self.counters.get(name, 0) + value
+
+    def timer(self, stage):
+        return _StageTimer(self, stage) if self.enabled else _NULL_TIMER
+
+    def record_stage(self, stage, seconds):
+        with self.lock:
+            entry = self.stages.get(stage)
+            if entry is None:
+                self.stages[stage] = [1, seconds, seconds]
+            else:
+                entry[0] += 1
+                entry[1] += seconds
+                entry[2] = max(entry[2], seconds)
+
+    def count(self, name, value=1):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
 
-    def load_user_ratings(self, file_path):
+    def observe(self, name, value):
+        if not self.enabled:
+            return
+        with self.lock:
+            entry = self.values.get(name)
+            if entry is None:
+                self.values[name] = [1, value, value]
+            else:
+                entry[0] += 1
+                entry[1] += value
+                entry[2] = max(entry[2], value)
+
+    def snapshot(self):
+        with self.lock:
+            hits, misses = self.counters.get('cache_hits', 0), self.counters.get('cache_misses', 0)
+            return {
+                'timestamp': time.time(),
+                'stages': {stage: {'calls': calls, 'total_seconds': total, 'max_seconds': longest}
+                           for stage, (calls, total, longest) in self.stages.items()},
+                'counters': dict(self.counters),
+                'values': {name: {'count': count, 'sum': total, 'max': largest}
+                           for name, (count, total, largest) in self.values.items()},
+                'cache_hit_rate': hits / (hits + misses) if hits + misses else 0.0,
+            }
+
+    def export(self):
+        if self.exporter is not None:
+            self.exporter.export(self.snapshot())
+
+
+metrics = Metrics()
+
+
+def instrumented(stage):
+    # Times every call of the decorated function as `stage` while metrics are enabled
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not metrics.enabled:
+                return func(*args, **kwargs)
+            with _StageTimer(metrics, stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+class JsonLinesExporter:
+    # Appends one JSON object per export
+    def __init__(self, file_path='metrics.jsonl'):
+        self.file_path = file_path
+
+    def export(self, snapshot):
+        with open(self.file_path, 'a') as file:
+            file.write(json.dumps(snapshot) + '\n')
+
+
+class PrometheusExporter:
+    # Prometheus text exposition format. The file is replaced atomically on every export, as the
+    # node_exporter textfile collector expects; format() is also served on GET /metrics.
+    def __init__(self, file_path='metrics.prom', prefix='rs'):
+        self.file_path = file_path
+        self.prefix = prefix
+
+    def format(self, snapshot):
+        prefix = self.prefix
+        lines = [f"# TYPE {prefix}_stage_seconds summary"]
+        for stage, stats in sorted(snapshot['stages'].items()):
+            lines.append(f'{prefix}_stage_seconds_count{{stage="{stage}"}} {stats["calls"]}')
+            lines.append(f'{prefix}_stage_seconds_sum{{stage="{stage}"}} {stats["total_seconds"]:.9g}')
+        lines.append(f"# TYPE {prefix}_stage_seconds_max gauge")
+        for stage, stats in sorted(snapshot['stages'].items()):
+            lines.append(f'{prefix}_stage_seconds_max{{stage="{stage}"}} {stats["max_seconds"]:.9g}')
+        for name, value in sorted(snapshot['counters'].items()):
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            lines.append(f"{prefix}_{name}_total {value}")
+        for name, stats in sorted(snapshot['values'].items()):
+            lines.append(f"# TYPE {prefix}_{name} summary")
+            lines.append(f"{prefix}_{name}_count {stats['count']}")
+            lines.append(f"{prefix}_{name}_sum {stats['sum']:.9g}")
+            lines.append(f"# TYPE {prefix}_{name}_max gauge")
+            lines.append(f"{prefix}_{name}_max {stats['max']:.9g}")
+        lines.append(f"# TYPE {prefix}_cache_hit_rate gauge")
+        lines.append(f"{prefix}_cache_hit_rate {snapshot['cache_hit_rate']:.6g}")
+        return '\n'.join(lines) + '\n'
+
+    def export(self, snapshot):
+        temporary = self.file_path + '.tmp'
+        with open(temporary, 'w') as file:
+            file.write(self.format(snapshot))
+        os.replace(temporary, self.file_path)
+
+
+class SamplingProfiler:
+    # Opt-in statistical profiler: a daemon thread records the stack of every other thread each
+    # interval seconds. Stacks are counted in the collapsed format read by flame graph tools.
+    def __init__(self, interval=0.01, file_path='profile.folded', max_depth=64):
+        self.interval = interval
+        self.file_path = file_path
+        self.max_depth = max_depth
+        self.samples = Counter()
+        self.lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self.file_path:
+            self.write_collapsed(self.file_path)
+
+    def _run(self):
+        own_thread = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            stacks = []
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_thread:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < self.max_depth:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                stacks.append(';'.join(reversed(stack)))
+            with self.lock:
+                self.samples.update(stacks)
+
+    def top(self, n=10):
+        with self.lock:
+            return self.samples.most_common(n)
+
+    def write_collapsed(self, file_path):
+        with self.lock:
+            samples = list(self.samples.items())
+        with open(file_path, 'w') as file:
+            for stack, count in samples:
+                file.write(f"{stack} {count}\n")
+
+
+_block_features = None
+_block_top_k = None
+
+
+def _init_similarity_worker(features, top_k):
+    # Each worker process receives the (row-normalised) feature matrix once
+    global _block_features, _block_top_k
+    _block_features = features
+    _block_top_k = top_k
+
+
+SIMILARITY_BLOCK_MEMORY = 256 * 2 ** 20  # Bytes of block scores + partition indices per worker
+
+
+def _similarity_block_size(num_movies, memory=SIMILARITY_BLOCK_MEMORY):
+    # Rows per block so that one float32 score row and one int64 argpartition row (12 bytes a
+    # movie) stay within `memory` per worker
+    return int(max(1, min(1024, memory // (12 * max(num_movies, 1)))))
+
+
+def _similarity_block(start, block_size):
+    # Top-K neighbours for feature rows [start, start + block_size), excluding each row itself.
+    # Only a block_size x N slice of the similarity matrix exists at any time, plus the
+    # block_size x N index array of argpartition.
+    block = _block_features[start:start + block_size] @ _block_features.T
+    rows = np.arange(block.shape[0])
+    block[rows, start + rows] = -np.inf
+    n = block.shape[1]
+    k = min(_block_top_k, n - 1)
+    neighbors = np.argpartition(block, n - k, axis=1)[:, n - k:] if k > 0 else np.empty((len(rows), 0), dtype=np.int64)
+    scores = np.take_along_axis(block, neighbors, axis=1)
+    order = np.lexsort((neighbors, -scores), axis=1)  # Best first, ties by catalog order
+    return np.take_along_axis(neighbors, order, axis=1), np.take_along_axis(scores, order, axis=1)
+
+
+_batch_system = None
+_batch_metrics = False
+
+
+def _init_batch_worker(movie_system, collect_metrics=False):
+    # collect_metrics: record metrics in this pool process and return them with every shard
+    global _batch_system, _batch_metrics
+    _batch_system = movie_system
+    _batch_metrics = collect_metrics
+    if collect_metrics:
+        metrics.reset()  # Drop anything inherited from the parent through fork
+        metrics.exporter = None
+        metrics.enabled = True
+
+
+def _batch_shard(user_ids, method, top_n):
+    # Top-N movie ids and scores for a shard of users, padded with -1 / 0, plus the shard's
+    # metrics when the worker collects them
+    movie_ids = np.full((len(user_ids), top_n), -1, dtype=np.int64)
+    scores = np.zeros((len(user_ids), top_n), dtype=np.float32)
+    for row, (recommended, recommended_scores) in enumerate(_batch_system.recommend_movie_ids(user_ids, method, top_n)):
+        movie_ids[row, :len(recommended)] = recommended
+        scores[row, :len(recommended)] = recommended_scores
+    return movie_ids, scores, metrics.collect() if _batch_metrics else None
+
+
+def _serve_recommendations(user_ids, recommendation_type, top_n):
+    # Runs in a server pool process started with _init_batch_worker
+    return [_batch_system.get_recommendations(user_id, recommendation_type, top_n) for user_id in user_ids]
+
+
+class RatingMatrix:
+    # Sparse user x movie rating store. Row r holds the ratings of user_ids[r],
+    # column c holds the ratings of movie_ids[c]; unrated entries are not stored.
+    def __init__(self, user_ids=(), movie_ids=(), matrix=None):
+        self.user_ids = np.asarray(user_ids, dtype=np.int64)
+        self.movie_ids = np.asarray(movie_ids, dtype=np.int64)
+        self.user_index = {int(user_id): row for row, user_id in enumerate(self.user_ids)}
+        self.movie_index = {int(movie_id): col for col, movie_id in enumerate(self.movie_ids)}
+        shape = (len(self.user_ids), len(self.movie_ids))
+        if matrix is None:
+            matrix = csr_matrix(shape, dtype=np.float32)
+        self._matrix = csr_matrix(matrix, shape=shape, dtype=np.float32)
+        self._matrix.sort_indices()
+        self._pending = {}  # (row, col) -> rating for entries not stored in the matrix yet
+        self._needs_pruning = False  # Removed ratings are stored as explicit zeros until then
+        self._squared = None
+        self._binary = None
+
+    @property
+    def matrix(self):
+        # Inserting into CSR shifts every later entry, so new entries are collected and merged
+        # in one pass on the next read; changes to stored entries are applied in place.
+        if self._pending or self._needs_pruning:
+            matrix = self._matrix
+            if self._pending:
+                (rows, cols), values = zip(*self._pending.keys()), list(self._pending.values())
+                matrix = matrix + csr_matrix((np.array(values, dtype=np.float32), (rows, cols)), shape=matrix.shape)
+            if self._needs_pruning:
+                matrix.eliminate_zeros()
+            matrix.sort_indices()
+            self._matrix = matrix
+            self._pending = {}
+            self._needs_pruning = False
+            self._squared = None
+            self._binary = None
+        return self._matrix
+
+    @classmethod
+    def from_wide_csv(cls, file_path, chunk_size=1_000_000, progress=None):
+        # One row per user: user_id followed by one rating per movie column (0 = not rated).
+        # Rows are streamed one at a time; progress(rows_read) is called every chunk_size rows
+        # and once at the end, like the chunked long-format reader.
         with open(file_path, 'r') as file:
             reader = csv.reader(file)
-            headers = next(reader)  # Skip header
+            headers = next(reader)
+            movie_ids = [int(movie_id) for movie_id in headers[1:]]
+            user_ids, indptr, indices, data = [], [0], [], []
+            rows_read = 0
             for row in reader:
+                rows_read += 1
+                if progress is not None and rows_read % chunk_size == 0:
+                    progress(rows_read)
                 if len(row) > 1:  # Check if row has enough elements
                     try:
                         user_id = int(row[0])
-                        ratings = list(map(int, row[1:]))
-                        self.user_ratings[user_id] = ratings
+                        ratings = np.array(list(map(int, row[1:len(movie_ids) + 1])), dtype=np.float32)
                     except ValueError as e:
                         print(f"Skipping line due to error: {e}")
+                        continue
+                    cols = np.flatnonzero(ratings)
+                    user_ids.append(user_id)
+                    indices.append(cols)
+                    data.append(ratings[cols])
+                    indptr.append(indptr[-1] + len(cols))
                 else:
                     print(f"Skipping incomplete row: {row}")
+            if progress is not None and rows_read % chunk_size:
+                progress(rows_read)
+
+        indices = np.concatenate(indices).astype(np.int32) if indices else np.empty(0, dtype=np.int32)
+        data = np.concatenate(data) if data else np.empty(0, dtype=np.float32)
+        matrix = csr_matrix((data, indices, np.array(indptr, dtype=np.int64)), shape=(len(user_ids), len(movie_ids)))
+        return cls(user_ids, movie_ids, matrix)
+
+    @classmethod
+    def from_long_csv(cls, file_path, user_ids=(), movie_ids=(), chunk_size=1_000_000, progress=None):
+        # One user_id,movie_id,rating line per rating, read in chunks of chunk_size lines.
+        # Rows/columns start with the given ids (e.g. every known user and catalog movie),
+        # followed by ids first seen in the file. A later line for the same pair wins and
+        # a rating of 0 removes the pair.
+        users, movies, ratings = [], [], []
+        for chunk in _read_csv_chunks(file_path, chunk_size, progress, usecols=['user_id', 'movie_id', 'rating'],
+                                      dtype={'user_id': np.int64, 'movie_id': np.int64, 'rating': np.float32}):
+            users.append(chunk['user_id'].to_numpy())
+            movies.append(chunk['movie_id'].to_numpy())
+            ratings.append(chunk['rating'].to_numpy())
+        return cls.from_triplets(users, movies, ratings, user_ids, movie_ids)
+
+    @classmethod
+    def from_triplets(cls, users, movies, ratings, user_ids=(), movie_ids=()):
+        # users / movies / ratings are parallel arrays, or lists of array chunks
+        if isinstance(users, list):
+            users = np.concatenate(users) if users else np.empty(0, dtype=np.int64)
+            movies = np.concatenate(movies) if movies else np.empty(0, dtype=np.int64)
+            ratings = np.concatenate(ratings) if ratings else np.empty(0, dtype=np.float32)
+        users = np.asarray(users, dtype=np.int64)
+        movies = np.asarray(movies, dtype=np.int64)
+        ratings = np.asarray(ratings, dtype=np.float32)
+
+        user_order = pd.unique(np.concatenate([np.asarray(user_ids, dtype=np.int64), users]))
+        movie_order = pd.unique(np.concatenate([np.asarray(movie_ids, dtype=np.int64), movies]))
+        rows = pd.Index(user_order).get_indexer(users)
+        cols = pd.Index(movie_order).get_indexer(movies)
+
+        _, last_reversed = np.unique((rows * len(movie_order) + cols)[::-1], return_index=True)
+        keep = len(rows) - 1 - last_reversed
+        keep = keep[ratings[keep] != 0]
+        matrix = csr_matrix((ratings[keep], (rows[keep], cols[keep])), shape=(len(user_order), len(movie_order)))
+        return cls(user_order, movie_order, matrix)
+
+    def __contains__(self, user_id):
+        return user_id in self.user_index
+
+    def __len__(self):
+        return len(self.user_ids)
+
+    def user_row(self, user_id):
+        # (movie_ids, ratings) of the movies rated by the user, in column order
+        row, matrix = self.user_index[user_id], self.matrix
+        start, end = matrix.indptr[row], matrix.indptr[row + 1]
+        return self.movie_ids[matrix.indices[start:end]], matrix.data[start:end].copy()
+
+    def dense_row(self, user_id):
+        row, matrix = self.user_index[user_id], self.matrix
+        start, end = matrix.indptr[row], matrix.indptr[row + 1]
+        ratings = np.zeros(len(self.movie_ids), dtype=np.float64)
+        ratings[matrix.indices[start:end]] = matrix.data[start:end]
+        return ratings
+
+    def add_user(self, user_id):
+        if user_id in self.user_index:
+            raise ValueError(f"User {user_id} already has a rating row.")
+        matrix = self._matrix
+        indptr = np.append(matrix.indptr, matrix.indptr[-1])
+        self._matrix = csr_matrix((matrix.data, matrix.indices, indptr), shape=(matrix.shape[0] + 1, matrix.shape[1]))
+        self.user_index[int(user_id)] = len(self.user_ids)
+        self.user_ids = np.append(self.user_ids, np.int64(user_id))
+        self._squared = None
+        self._binary = None
+
+    def add_movie(self, movie_id):
+        # A new, empty column: only the shape changes
+        if movie_id in self.movie_index:
+            raise ValueError(f"Movie {movie_id} already has a rating column.")
+        matrix = self._matrix
+        self._matrix = csr_matrix((matrix.data, matrix.indices, matrix.indptr), shape=(matrix.shape[0], matrix.shape[1] + 1))
+        self.movie_index[int(movie_id)] = len(self.movie_ids)
+        self.movie_ids = np.append(self.movie_ids, np.int64(movie_id))
+        self._squared = None
+        self._binary = None
+
+    def set_rating(self, user_id, movie_id, rating):
+        # rating 0 removes the user's rating of the movie
+        row, col = self.user_index[user_id], self.movie_index[movie_id]
+        matrix = self._matrix
+        start, end = matrix.indptr[row], matrix.indptr[row + 1]
+        position = start + np.searchsorted(matrix.indices[start:end], col)
+
+        if position < end and matrix.indices[position] == col:
+            matrix.data[position] = rating
+            if self._squared is not None:
+                self._squared.data[position] = rating ** 2
+                self._binary.data[position] = 1 if rating != 0 else 0
+            self._pending.pop((row, col), None)
+            self._needs_pruning = self._needs_pruning or rating == 0
+        elif rating != 0:
+            self._pending[(row, col)] = rating
+        else:
+            self._pending.pop((row, col), None)
+
+    def _norm_matrices(self):
+        # Squared ratings and a rated/not rated indicator with the rating matrix's sparsity
+        # pattern, sharing its index arrays
+        matrix = self.matrix
+        if self._squared is None:
+            self._squared = csr_matrix((matrix.data ** 2, matrix.indices, matrix.indptr), shape=matrix.shape)
+            self._binary = csr_matrix((np.ones_like(matrix.data), matrix.indices, matrix.indptr), shape=matrix.shape)
+        return matrix, self._squared, self._binary
+
+    def user_similarities(self, user_id):
+        # Cosine similarity between the user and every row, restricted to co-rated movies
+        # (same definition as MovieRecommendationSystem.calculate_similarity), in one pass
+        # of sparse products instead of one comparison per user.
+        matrix, squared, binary = self._norm_matrices()
+        target = self.dense_row(user_id)
+        rated = (target != 0).astype(np.float64)
+
+        dot = matrix @ target
+        other_norm = squared @ rated  # sum of v_i^2 over the movies the target rated
+        target_norm = binary @ (target ** 2)  # sum of u_i^2 over the movies the other user rated
+        denom = np.sqrt(other_norm * target_norm)
+
+        similarities = np.zeros(len(self.user_ids), dtype=np.float64)
+        np.divide(dot, denom, out=similarities, where=denom > 0)
+        return similarities
+
+    def block_similarities(self, rows):
+        # Same similarity as user_similarities for a block of rows at once, as a sparse
+        # len(rows) x users matrix holding only the pairs that share at least one movie.
+        matrix, squared, binary = self._norm_matrices()
+        block = matrix[rows]
+        block_rated = csr_matrix((np.ones_like(block.data), block.indices, block.indptr), shape=block.shape)
+        block_squared = csr_matrix((block.data ** 2, block.indices, block.indptr), shape=block.shape)
+
+        # All three products share the co-rated sparsity pattern, so they line up entry by entry
+        dot = (matrix @ block.T).T.tocsr()
+        other_norm = (squared @ block_rated.T).T.tocsr()
+        target_norm = (binary @ block_squared.T).T.tocsr()
+        for product in (dot, other_norm, target_norm):
+            product.sort_indices()
+
+        denom = np.sqrt(other_norm.data.astype(np.float64) * target_norm.data.astype(np.float64))
+        data = np.zeros(len(dot.data), dtype=np.float64)
+        np.divide(dot.data.astype(np.float64), denom, out=data, where=denom > 0)
+        return csr_matrix((data, dot.indices, dot.indptr), shape=dot.shape)
+
+class ItemNeighborIndex:
+    # The top-K most similar movies of every movie. Row r belongs to movie_ids[r]; neighbors[r]
+    # holds row positions of its neighbours and scores[r] their similarities, best first.
+    # Rows with fewer than K neighbours are padded with -1 / 0. feature_fit is the movie feature
+    # encoding the index was built with (see MovieRecommendationSystem.movie_features), None if
+    # unknown, e.g. for CSV files.
+    def __init__(self, movie_ids, neighbors, scores, feature_fit=None):
+        self.movie_ids = np.asarray(movie_ids, dtype=np.int64)
+        self.neighbors = np.asarray(neighbors, dtype=np.int32)
+        self.scores = np.asarray(scores, dtype=np.float32)
+        self.feature_fit = feature_fit
+        self._movie_index = None
+
+    @property
+    def movie_index(self):
+        # Built on first use so that opening a memory-mapped index stays instant
+        if self._movie_index is None:
+            self._movie_index = {int(movie_id): row for row, movie_id in enumerate(self.movie_ids)}
+        return self._movie_index
+
+    @property
+    def top_k(self):
+        return self.neighbors.shape[1]
+
+    @classmethod
+    def load(cls, file_path):
+        meta, arrays = open_artifact(file_path, kind='item_neighbors')
+        return cls(arrays['movie_ids'], arrays['neighbors'], arrays['scores'], meta.get('feature_fit'))
+
+    def save(self, file_path):
+        write_artifact(file_path, 'item_neighbors', {
+            'movie_ids': self.movie_ids,
+            'neighbors': self.neighbors,
+            'scores': self.scores,
+        }, meta={'feature_fit': self.feature_fit})
+
+    @classmethod
+    def from_file(cls, file_path, top_k=None):
+        # Binary artifact, long-format neighbour CSV or dense similarity CSV
+        if is_artifact(file_path):
+            index = cls.load(file_path)
+        else:
+            with open(file_path, 'r') as file:
+                header = file.readline().strip()
+            if header.startswith('movie_id,neighbor_id'):
+                index = cls.from_neighbor_csv(file_path)
+            else:
+                return cls.from_similarity_csv(file_path, top_k=top_k or 5)
+        if top_k is not None and top_k < index.top_k:
+            index.neighbors, index.scores = index.neighbors[:, :top_k], index.scores[:, :top_k]
+        return index
+
+    @classmethod
+    def from_similarity_csv(cls, file_path, top_k=5):
+        # Reads a dense similarity matrix (id column + one column per movie) row by row,
+        # keeping only the top-K of each row so the full N x N table is never held in memory.
+        with open(file_path, 'r') as file:
+            reader = csv.reader(file)
+            headers = next(reader)
+            column_ids = np.array([int(movie_id) for movie_id in headers[1:]], dtype=np.int64)
+            k = min(top_k, len(column_ids) - 1)
+            row_ids, neighbors, scores = [], [], []
+            for row in reader:
+                if not row:
+                    continue
+                row_ids.append(int(row[0]))
+                similarities = np.array(row[1:], dtype=np.float64)
+                similarities[column_ids == row_ids[-1]] = -np.inf  # Remove the movie itself
+                best = _top_k_indices(similarities, k)
+                neighbors.append(best)
+                scores.append(similarities[best])
+
+        # Columns are addressed by movie id; store neighbours as row positions of this index
+        row_index = {movie_id: row for row, movie_id in enumerate(row_ids)}
+        column_rows = np.array([row_index[int(movie_id)] for movie_id in column_ids], dtype=np.int32)
+        neighbors = column_rows[np.array(neighbors, dtype=np.int64).reshape(len(row_ids), k)]
+        return cls(row_ids, neighbors, np.array(scores).reshape(len(row_ids), k))
+
+    @classmethod
+    def from_neighbor_csv(cls, file_path):
+        # Long format written by generate_similarity_matrix(top_k=...):
+        # movie_id,neighbor_id,score with each movie's rows contiguous and best first
+        df = pd.read_csv(file_path, dtype={'movie_id': np.int64, 'neighbor_id': np.int64, 'score': np.float32})
+        rows, movie_ids = pd.factorize(df['movie_id'])
+        ranks = df.groupby(rows).cumcount().to_numpy()
+        k = int(ranks.max()) + 1 if len(ranks) else 0
+
+        neighbors = np.full((len(movie_ids), k), -1, dtype=np.int32)
+        scores = np.zeros((len(movie_ids), k), dtype=np.float32)
+        neighbors[rows, ranks] = pd.Index(movie_ids).get_indexer(df['neighbor_id'])
+        scores[rows, ranks] = df['score'].to_numpy()
+        return cls(movie_ids, neighbors, scores)
+
+    def add_movie(self, movie_id, similarities):
+        # Adds a row for a new movie given its similarity to every existing row, and splices it
+        # into the rows of existing movies it now beats; no other row is touched.
+        similarities = np.asarray(similarities, dtype=np.float32)
+        new_row, k = len(self.movie_ids), self.top_k
+        best = _top_k_indices(similarities, k)
+
+        neighbors = np.full((1, k), -1, dtype=np.int32)
+        scores = np.zeros((1, k), dtype=np.float32)
+        neighbors[0, :len(best)] = best
+        scores[0, :len(best)] = similarities[best]
+        self.neighbors = np.vstack([self.neighbors, neighbors])
+        self.scores = np.vstack([self.scores, scores])
+        self.movie_ids = np.append(self.movie_ids, np.int64(movie_id))
+        if self._movie_index is not None:
+            self._movie_index[int(movie_id)] = new_row
+        if k == 0:
+            return
 
-    def load_similarity_matrix(self, file_path):
-        self.similarity_matrix = pd.read_csv(file_path, index_col=0)
+        worst = np.where(self.neighbors[:new_row, -1] < 0, -np.inf, self.scores[:new_row, -1])
+        for row in np.flatnonzero(similarities > worst):
+            similarity = similarities[row]
+            position = np.count_nonzero((self.neighbors[row] >= 0) & (self.scores[row] >= similarity))
+            self.neighbors[row, position + 1:] = self.neighbors[row, position:-1].copy()
+            self.scores[row, position + 1:] = self.scores[row, position:-1].copy()
+            self.neighbors[row, position] = new_row
+            self.scores[row, position] = similarity
+
+    def score_movies(self, movie_ids, weights, neighbors_per_movie=None):
+        # Sum of similarity * weight over the neighbours of the given movies, as a single
+        # scatter-add. Returns (candidate_movie_ids, scores) for every movie that was reached.
+        k = self.top_k if neighbors_per_movie is None else min(neighbors_per_movie, self.top_k)
+        rows, row_weights = [], []
+        for movie_id, weight in zip(movie_ids, weights):
+            row = self.movie_index.get(int(movie_id))
+            if row is not None:
+                rows.append(row)
+                row_weights.append(weight)
+        if not rows:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+
+        neighbors = self.neighbors[rows, :k].ravel()
+        contributions = (self.scores[rows, :k].astype(np.float64) * np.array(row_weights, dtype=np.float64)[:, None]).ravel()
+        valid = neighbors >= 0
+        neighbors, contributions = neighbors[valid], contributions[valid]
+
+        totals = np.bincount(neighbors, weights=contributions, minlength=len(self.movie_ids))
+        candidates = np.unique(neighbors)
+        return self.movie_ids[candidates], totals[candidates]
+
+
+class ALSModel:
+    # Low-rank factorization ratings ~ user_factors @ item_factors.T fitted to the observed
+    # ratings with alternating least squares (regularisation scaled by each row's rating count).
+    # Training is offline; predicting for a user is one matrix-vector product plus a top-N.
+    def __init__(self, user_ids, movie_ids, user_factors, item_factors):
+        self.user_ids = np.asarray(user_ids, dtype=np.int64)
+        self.movie_ids = np.asarray(movie_ids, dtype=np.int64)
+        self.user_factors = np.asarray(user_factors, dtype=np.float32)
+        self.item_factors = np.asarray(item_factors, dtype=np.float32)
+        self.user_index = {int(user_id): row for row, user_id in enumerate(self.user_ids)}
+
+    @classmethod
+    def train(cls, rating_matrix, factors=20, regularization=0.1, iterations=10, workers=None, block_size=1024, seed=0):
+        ratings = rating_matrix.matrix
+        ratings_by_item = ratings.T.tocsr()
+        rng = np.random.default_rng(seed)
+        user_factors = rng.normal(scale=0.1, size=(ratings.shape[0], factors)).astype(np.float32)
+        item_factors = rng.normal(scale=0.1, size=(ratings.shape[1], factors)).astype(np.float32)
+
+        with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1) as executor:
+            for iteration in range(iterations):
+                user_factors = cls._solve(ratings, item_factors, regularization, executor, block_size)
+                item_factors = cls._solve(ratings_by_item, user_factors, regularization, executor, block_size)
+        return cls(rating_matrix.user_ids, rating_matrix.movie_ids, user_factors, item_factors)
+
+    @staticmethod
+    def _solve(ratings, fixed, regularization, executor, block_size):
+        # Least-squares factors for every row of `ratings` given the other side's factors,
+        # one batched solve per block of rows; blocks run on the thread pool (NumPy releases the GIL)
+        factors = fixed.shape[1]
+        solved = np.zeros((ratings.shape[0], factors), dtype=np.float32)
+
+        def solve_block(start):
+            block = ratings[start:start + block_size]
+            counts = np.diff(block.indptr)
+            gram = ALSModel._gram_matrices(block, fixed)
+            gram += regularization * np.maximum(counts, 1)[:, None, None] * np.eye(factors)
+            rhs = block @ fixed.astype(np.float64)
+            solved[start:start + block.shape[0]] = np.linalg.solve(gram, rhs[:, :, None])[:, :, 0]
+
+        list(executor.map(solve_block, range(0, ratings.shape[0], block_size)))
+        return solved
+
+    GRAM_CHUNK_ENTRIES = 2 ** 22  # Outer-product values (float64) materialised at once: 32 MiB
+
+    @staticmethod
+    def _gram_matrices(block, fixed):
+        # Gram matrix of the rated items' factors for every row of `block`. Runs of light rows are
+        # handled together as segment sums of outer products, at most GRAM_CHUNK_ENTRIES values
+        # at a time; a row with more ratings than fit in one chunk gets one BLAS product instead.
+        factors = fixed.shape[1]
+        indptr = block.indptr
+        gram = np.zeros((block.shape[0], factors, factors))
+        limit = max(1, ALSModel.GRAM_CHUNK_ENTRIES // (factors * factors))  # Ratings per chunk
+        row = 0
+        while row < block.shape[0]:
+            if indptr[row + 1] - indptr[row] > limit:
+                selected = fixed[block.indices[indptr[row]:indptr[row + 1]]].astype(np.float64)
+                gram[row] = selected.T @ selected
+                row += 1
+                continue
+            end = np.searchsorted(indptr, indptr[row] + limit, side='right') - 1
+            selected = fixed[block.indices[indptr[row]:indptr[end]]].astype(np.float64)
+            starts = indptr[row:end] - indptr[row]
+            rated = np.diff(indptr[row:end + 1]) > 0
+            if rated.any():
+                outer = np.einsum('ni,nj->nij', selected, selected)
+                gram[row:end][rated] = np.add.reduceat(outer, starts[rated], axis=0)
+            row = end
+        return gram
+
+    @classmethod
+    def load(cls, file_path):
+        meta, arrays = open_artifact(file_path, kind='als_model')
+        return cls(arrays['user_ids'], arrays['movie_ids'], arrays['user_factors'], arrays['item_factors'])
+
+    def save(self, file_path):
+        write_artifact(file_path, 'als_model', {
+            'user_ids': self.user_ids,
+            'movie_ids': self.movie_ids,
+            'user_factors': self.user_factors,
+            'item_factors': self.item_factors,
+        })
+
+    def __contains__(self, user_id):
+        return user_id in self.user_index
+
+    def recommend(self, user_id, rated_movie_ids, top_n):
+        # Highest predicted ratings among the movies the user has not rated
+        with metrics.timer('als.scoring'):
+            scores = self.item_factors @ self.user_factors[self.user_index[user_id]]
+            rated = np.isin(self.movie_ids, rated_movie_ids)
+            candidates = np.flatnonzero(~rated)
+        metrics.observe('candidate_set_size', len(candidates))
+        with metrics.timer('als.top_n'):
+            best = candidates[_top_k_indices(scores[candidates], top_n)]
+        return self.movie_ids[best], scores[best]
+
+
+class BatchRecommendations:
+    # Precomputed top-N recommendations written by MovieRecommendationSystem.batch_recommendations.
+    # Row r holds the movie ids (padded with -1) and scores for user_ids[r]. New files store
+    # user_ids sorted, so a lookup is a binary search over the mapped array. stale_users holds
+    # users whose ratings changed since the file was loaded; their rows are no longer served.
+    def __init__(self, user_ids, movie_ids, scores, method, top_n=None, prediction_engine=None, sorted_user_ids=False):
+        self.user_ids = user_ids
+        self.movie_ids = movie_ids
+        self.scores = scores
+        self.method = method
+        self.top_n = movie_ids.shape[1] if top_n is None else top_n
+        self.prediction_engine = prediction_engine
+        self.sorted_user_ids = sorted_user_ids
+        self.stale_users = set()
+        self._search = None
+
+    @classmethod
+    def load(cls, file_path):
+        meta, arrays = open_artifact(file_path, kind='batch_recommendations')
+        return cls(arrays['user_ids'], arrays['movie_ids'], arrays['scores'], meta['method'], meta.get('top_n'),
+                   meta.get('prediction_engine'), meta.get('sorted_user_ids', False))
+
+    def _row(self, user_id):
+        if self._search is None:
+            if self.sorted_user_ids:
+                self._search = (self.user_ids, None)
+            else:  # Older files are searched through a sorted copy of their user ids
+                order = np.argsort(self.user_ids, kind='stable')
+                self._search = (self.user_ids[order], order)
+        user_ids, order = self._search
+        position = int(np.searchsorted(user_ids, user_id))
+        if position == len(user_ids) or user_ids[position] != user_id:
+            return None
+        return position if order is None else int(order[position])
+
+    def lookup(self, user_id):
+        row = self._row(user_id)
+        if row is None:
+            return None
+        movie_ids = self.movie_ids[row]
+        valid = movie_ids >= 0
+        return movie_ids[valid], self.scores[row][valid]
+
+
+class MovieRankings:
+    # Movies kept sorted by rating and by views, globally and per genre, so top-N lists are
+    # slices instead of catalog sorts. Keys are (-value, catalog position, movie_id): ties
+    # keep catalog order like a stable sort over self.movies. update_movie moves one movie.
+    def __init__(self, movies):
+        self.by_rating = []
+        self.by_views = []
+        self.genre_by_rating = {}
+        self._entries = {}
+        self._next_position = 0
+        for movie_id, movie_info in movies.items():
+            self._entries[movie_id] = self._keys(movie_id, movie_info)
+        for rating_key, views_key, genre in self._entries.values():
+            self.by_rating.append(rating_key)
+            self.by_views.append(views_key)
+            self.genre_by_rating.setdefault(genre, []).append(rating_key)
+        self.by_rating.sort()
+        self.by_views.sort()
+        for keys in self.genre_by_rating.values():
+            keys.sort()
+
+    def _keys(self, movie_id, movie_info):
+        entry = self._entries.get(movie_id)
+        position = entry[0][1] if entry is not None else self._next_position
+        self._next_position = max(self._next_position, position + 1)
+        return (-movie_info["rating"], position, movie_id), (-movie_info["view"], position, movie_id), movie_info["genre"]
+
+    def update_movie(self, movie_id, movie_info):
+        # Adds the movie, or moves it after its rating, views or genre changed
+        if movie_id in self._entries:
+            rating_key, views_key, genre = self._entries[movie_id]
+            self._remove(self.by_rating, rating_key)
+            self._remove(self.by_views, views_key)
+            self._remove(self.genre_by_rating[genre], rating_key)
+        rating_key, views_key, genre = self._entries[movie_id] = self._keys(movie_id, movie_info)
+        bisect.insort(self.by_rating, rating_key)
+        bisect.insort(self.by_views, views_key)
+        bisect.insort(self.genre_by_rating.setdefault(genre, []), rating_key)
+
+    def _remove(self, keys, key):
+        del keys[bisect.bisect_left(keys, key)]
+
+    def top_by_rating(self, n, genres=None):
+        # With genres, only movies whose genre contains one of them (substring match)
+        if genres is None:
+            keys = self.by_rating[:n]
+        else:
+            lists = [keys for genre, keys in self.genre_by_rating.items() if any(name in genre for name in genres)]
+            keys = islice(heapq.merge(*lists), n)
+        return [movie_id for _, _, movie_id in keys]
+
+    def top_by_views(self, n):
+        return [movie_id for _, _, movie_id in self.by_views[:n]]
+
+
+class RecommendationCache:
+    # Thread-safe LRU cache with an optional time-to-live and hit/miss statistics. Keys include
+    # the system's data_version, so entries computed before a data change are never returned
+    # and simply age out of the LRU order.
+    def __init__(self, maxsize=1024, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and self.ttl is not None and time.monotonic() - entry[1] > self.ttl:
+                del self.entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                metrics.count('cache_misses')
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            metrics.count('cache_hits')
+            return entry[0]
+
+    def __getstate__(self):
+        # Pickled (e.g. with the system, for a spawned worker process) as an empty cache
+        state = self.__dict__.copy()
+        del state['lock'], state['entries']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self.lock:
+            self.entries[key] = (value, time.monotonic())
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            requests = self.hits + self.misses
+            return {
+                'size': len(self.entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_rate': self.hits / requests if requests else 0.0,
+            }
+
+
+class BufferedCsvWriter:
+    # Collects CSV rows in memory and appends them in one write + fsync every flush_every rows,
+    # on flush() and at interpreter exit.
+    def __init__(self, file_path, flush_every=32):
+        self.file_path = file_path
+        self.flush_every = flush_every
+        self.rows = []
+        atexit.register(self.flush)
+
+    def append(self, row):
+        self.rows.append(row)
+        if len(self.rows) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        with open(self.file_path, 'a+b') as file:
+            # Files written by hand may not end with a newline
+            needs_newline = False
+            if file.seek(0, os.SEEK_END) > 0:
+                file.seek(-1, os.SEEK_END)
+                needs_newline = file.read(1) != b'\n'
+        with open(self.file_path, 'a', newline='') as file:
+            if needs_newline:
+                file.write('\r\n')
+            csv.writer(file).writerows(self.rows)
+            file.flush()
+            os.fsync(file.fileno())
+        self.rows = []
+
+
+class Storage:
+    # Where MovieRecommendationSystem persists changes. Writes may be buffered until flush().
+    # This base class is the null store: it accepts every change and keeps none of them.
+    def add_user(self, user_id, user_info):
+        pass
+
+    def create_user(self, user_info, user_id):
+        # Persists a newly registered user and returns its id. user_id is the next free id of the
+        # calling process; stores shared between processes allocate the id themselves.
+        self.add_user(user_id, user_info)
+        return user_id
+
+    def save_movie(self, movie_id, movie_info):
+        pass
+
+    def save_ratings(self, ratings):
+        # ratings: iterable of (user_id, movie_id, rating); rating 0 removes the rating
+        pass
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.flush()
+
+
+class CsvStorage(Storage):
+    # The original CSV files. New users are appended to the user file; ratings are appended to a
+    # long ratings file (later lines win), or as an all-zero row per new user to a wide one.
+    # CSV rows cannot be updated in place, so movie changes and wide-file ratings stay in memory.
+    def __init__(self, user_file='user.csv', ratings_file='ratings.csv', flush_every=32):
+        self.user_writer = BufferedCsvWriter(user_file, flush_every)
+        self.ratings_writer = BufferedCsvWriter(ratings_file, flush_every)
+        self.ratings_format = 'wide'
+        self.wide_movie_count = 0
+
+    def add_user(self, user_id, user_info):
+        self.user_writer.append([user_id, user_info['name'], user_info['password'], user_info['age'], user_info['gender']])
+        if self.ratings_format == 'wide':
+            self.ratings_writer.append([user_id] + [0] * self.wide_movie_count)
+
+    def save_ratings(self, ratings):
+        if self.ratings_format == 'long':
+            for user_id, movie_id, rating in ratings:
+                self.ratings_writer.append([user_id, movie_id, rating])
+
+    def flush(self):
+        self.user_writer.flush()
+        self.ratings_writer.flush()
+
+
+class SQLiteStorage(Storage):
+    # Embedded SQLite database in WAL mode, so several processes can read while one writes.
+    # Changes are queued and written in one transaction per flush (every batch_size changes,
+    # on flush() and at exit).
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS movies (
+            id INTEGER PRIMARY KEY,
+            title TEXT NOT NULL,
+            genre TEXT NOT NULL,
+            release_year INTEGER,
+            view INTEGER NOT NULL DEFAULT 0,
+            rating REAL NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS movies_genre ON movies (genre);
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE,
+            password TEXT NOT NULL,
+            age INTEGER,
+            gender TEXT
+        );
+        CREATE TABLE IF NOT EXISTS ratings (
+            user_id INTEGER NOT NULL,
+            movie_id INTEGER NOT NULL,
+            rating REAL NOT NULL,
+            PRIMARY KEY (user_id, movie_id)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS ratings_movie ON ratings (movie_id);
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        );
+        INSERT OR IGNORE INTO meta (key, value) VALUES ('database_id', abs(random())), ('changes', 0),
+            ('next_user_id', 1);
+    """
+    # Run in every write transaction; snapshots compare the counter to detect changed data
+    COUNT_CHANGE = "UPDATE meta SET value = value + 1 WHERE key = 'changes'"
+    # Claims the next user id past every stored profile and every user with ratings (imports keep
+    # ratings of users without a profile). The UPDATE takes the write lock before anything is read.
+    CLAIM_USER_ID = """
+        UPDATE meta SET value = max(value, (SELECT coalesce(max(id), 0) FROM users) + 1,
+                                    (SELECT coalesce(max(user_id), 0) FROM ratings) + 1) + 1
+        WHERE key = 'next_user_id'
+    """
+
+    def __init__(self, file_path='recommendations.db', batch_size=1000):
+        self.file_path = file_path
+        self.batch_size = batch_size
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(file_path, timeout=30, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.executescript(self.SCHEMA)
+        self.pending_users = []
+        self.pending_movies = []
+        self.pending_ratings = []
+        atexit.register(self.close)
+
+    def _queued(self):
+        if len(self.pending_users) + len(self.pending_movies) + len(self.pending_ratings) >= self.batch_size:
+            self.flush()
+
+    def add_user(self, user_id, user_info):
+        with self.lock:
+            self.pending_users.append((user_id, user_info['name'], user_info['password'], user_info['age'], user_info['gender']))
+        self._queued()
+
+    def create_user(self, user_info, user_id=None):
+        # Inserted straight away, outside the batch: the database allocates the id and the UNIQUE
+        # name rejects a name another process registered first
+        self.flush()
+        with self.lock:
+            try:
+                with self.connection:
+                    self.connection.execute(self.CLAIM_USER_ID)
+                    user_id = self.connection.execute("SELECT value - 1 FROM meta WHERE key = 'next_user_id'").fetchone()[0]
+                    self.connection.execute(
+                        "INSERT INTO users (id, name, password, age, gender) VALUES (?, ?, ?, ?, ?)",
+                        (user_id, user_info['name'], user_info['password'], user_info['age'], user_info['gender']))
+                    self.connection.execute(self.COUNT_CHANGE)
+            except sqlite3.IntegrityError:
+                raise ValueError("Username already exists.") from None
+            return user_id
+
+    def save_movie(self, movie_id, movie_info):
+        with self.lock:
+            self.pending_movies.append((movie_id, movie_info['title'], movie_info['genre'], movie_info.get('release_year'),
+                                        movie_info['view'], movie_info['rating']))
+        self._queued()
+
+    def save_ratings(self, ratings):
+        with self.lock:
+            self.pending_ratings.extend((int(user_id), int(movie_id), float(rating)) for user_id, movie_id, rating in ratings)
+        self._queued()
+
+    def flush(self):
+        with self.lock:
+            if self.connection is None or not (self.pending_users or self.pending_movies or self.pending_ratings):
+                return
+            with self.connection:  # One transaction
+                self.connection.execute(self.COUNT_CHANGE)
+                # Existing users (imports): a user id or name that is already stored is left as it is
+                self.connection.executemany(
+                    "INSERT OR IGNORE INTO users (id, name, password, age, gender) VALUES (?, ?, ?, ?, ?)",
+                    self.pending_users)
+                self.connection.executemany(
+                    "INSERT INTO movies (id, title, genre, release_year, view, rating) VALUES (?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (id) DO UPDATE SET title = excluded.title, genre = excluded.genre, "
+                    "release_year = excluded.release_year, view = excluded.view, rating = excluded.rating",
+                    self.pending_movies)
+                # Apply ratings in order, then drop the pairs whose final rating is 0
+                self.connection.executemany(
+                    "INSERT INTO ratings (user_id, movie_id, rating) VALUES (?, ?, ?) "
+                    "ON CONFLICT (user_id, movie_id) DO UPDATE SET rating = excluded.rating", self.pending_ratings)
+                self.connection.executemany(
+                    "DELETE FROM ratings WHERE user_id = ? AND movie_id = ? AND rating = 0",
+                    [(user_id, movie_id) for user_id, movie_id, rating in self.pending_ratings if rating == 0])
+            self.pending_users, self.pending_movies, self.pending_ratings = [], [], []
+
+    def close(self):
+        self.flush()
+        with self.lock:
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
+
+    def _select_chunks(self, query, chunk_size):
+        with self.lock:
+            cursor = self.connection.execute(query)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield rows
+
+    def load_movies(self, chunk_size=100_000):
+        return self._select_chunks("SELECT id, title, genre, release_year, view, rating FROM movies ORDER BY id", chunk_size)
+
+    def load_users(self, chunk_size=100_000):
+        return self._select_chunks("SELECT id, name, password, age, gender FROM users ORDER BY id", chunk_size)
+
+    def load_ratings(self, chunk_size=1_000_000):
+        for rows in self._select_chunks("SELECT user_id, movie_id, rating FROM ratings", chunk_size):
+            users, movies, ratings = zip(*rows)
+            yield np.array(users, dtype=np.int64), np.array(movies, dtype=np.int64), np.array(ratings, dtype=np.float32)
+
+    def import_csv(self, movie_file='data.csv', user_file='user.csv', ratings_file='ratings.csv'):
+        # Copies the CSV data set (wide or long ratings) into the database
+        movie_system = MovieRecommendationSystem(storage=Storage())
+        movie_system.load_movie_data(movie_file)
+        movie_system.load_user_data(user_file)
+        movie_system.load_user_ratings(ratings_file)
+
+        for movie_id, movie_info in movie_system.movies.items():
+            self.save_movie(movie_id, movie_info)
+        for user_id, user_info in movie_system.user_data.items():
+            if movie_system.users.find_by_name(user_info['name']) != user_id:
+                print(f"Skipping user {user_id} due to a duplicate name")  # Names are unique in the database
+                continue
+            self.add_user(user_id, user_info)
+        matrix = movie_system.rating_matrix
+        coo = matrix.matrix.tocoo()
+        for start in range(0, coo.nnz, self.batch_size):
+            end = start + self.batch_size
+            self.save_ratings(zip(matrix.user_ids[coo.row[start:end]], matrix.movie_ids[coo.col[start:end]], coo.data[start:end]))
+        self.flush()
+
+
+class UserStore:
+    # User records by id plus a name -> id index, so lookups by name do not scan every user.
+    # New users are persisted through the system's Storage, which hands out their ids: the
+    # next id after the largest one seen (profiles and rating rows), or the database's own
+    # for SQLiteStorage.
+    def __init__(self, storage):
+        self.users = {}
+        self.name_index = {}
+        self.next_id = 1
+        self.storage = storage
+
+    def __contains__(self, user_id):
+        return user_id in self.users
+
+    def __len__(self):
+        return len(self.users)
+
+    def add(self, user_id, user_info):
+        self.users[user_id] = user_info
+        self.name_index.setdefault(user_info['name'], user_id)  # First user with a name wins, as in a scan
+        self.next_id = max(self.next_id, user_id + 1)
+
+    def find_by_name(self, name):
+        return self.name_index.get(name)
+
+    def register(self, name, password, age, gender, min_id=1):
+        # Raises ValueError if the storage already holds the name. min_id is the lowest id the
+        # new user may get, so ids of users that only have ratings are never handed out again.
+        user_info = {
+            'name': name,
+            'password': password,
+            'age': age,
+            'gender': gender,
+            'ratings': []  # Initialize an empty list for user ratings
+        }
+        user_id = self.storage.create_user(user_info, max(self.next_id, min_id))
+        self.add(user_id, user_info)
+        return user_id
 
-    def recommend_movies_based_on_similarity(self):
-        if self.logged_in_user is None:
-            return "Please login first to get recommendations."
+    def flush(self):
+        self.storage.flush()
 
-        user_ratings = self.user_ratings[self.logged_in_user]
 
-        # Collect all movies rated by the user with a rating from 1 to 10
-        rated_movies = [(i + 1, rating) for i, rating in enumerate(user_ratings) if 1 <= rating <= 10]
+UNKNOWN_RELEASE_YEAR = 0
+
+
+class MovieRecommendationSystem:
+    RECOMMENDATION_TYPES = ("based_predict_user_ratings", "based_on_gender", "based_existing_user_recommendations",
+                            "based_on_similarity")
+    # Recommendation type -> batch_recommendations method that precomputes it
+    BATCH_METHODS = {
+        "based_predict_user_ratings": 'predict_user_ratings',
+        "based_existing_user_recommendations": 'existing_user_recommendations',
+        "based_on_similarity": 'recommend_movies_based_on_similarity',
+    }
+
+    def __init__(self, cache_size=1024, cache_ttl=None, storage=None):
+        self.movies = {}
+        self.storage = storage if storage is not None else CsvStorage()
+        self.users = UserStore(self.storage)
+        self.user_data = self.users.users
+        self.rating_matrix = RatingMatrix()
+        self.logged_in_user = None
+        self.item_neighbors = None
+        self.precomputed = {}
+        self._rankings = None
+        self.data_version = 0  # Bumped on every data change; part of every cache key
+        self.prediction_engine = 'user_user'
+        self.als_model = None
+        self.cache = RecommendationCache(cache_size, cache_ttl)
+        self.sources = {}  # Name -> path of every file the loaded state was read from
+
+    def __getstate__(self):
+        # Copies sent to worker processes only read, so they get the null Storage instead of the
+        # system's CSV writers or database connection
+        state = self.__dict__.copy()
+        state['storage'] = Storage()
+        state['users'] = copy.copy(self.users)
+        state['users'].storage = state['storage']
+        return state
+
+    @property
+    def rankings(self):
+        # Built on first use from the loaded catalog, then kept up to date by add_movie / update_movie
+        if self._rankings is None:
+            self._rankings = MovieRankings(self.movies)
+        return self._rankings
+
+    @instrumented('load_movie_data')
+    def load_movie_data(self, file_path, chunk_size=100_000, progress=None):
+        # Proper CSV parsing (titles may contain quoted commas), chunk_size lines at a time
+        self._rankings = None
+        self.data_version += 1
+        self.sources['movies'] = file_path
+        columns = ['id', 'title', 'genre', 'release_year', 'view', 'rating']
+        for chunk in _read_csv_chunks(file_path, chunk_size, progress, header=0, names=columns, usecols=range(len(columns)),
+                                      dtype=str, keep_default_na=False):
+            ids = chunk['id'].str.strip()
+            numbers = {column: pd.to_numeric(chunk[column], errors='coerce') for column in ['id', 'view', 'rating']}
+            valid = pd.concat(numbers, axis=1).notna().all(axis=1)
+            # The year is optional; a missing or invalid one is stored as UNKNOWN_RELEASE_YEAR
+            numbers['release_year'] = pd.to_numeric(chunk['release_year'], errors='coerce').fillna(UNKNOWN_RELEASE_YEAR)
+            for id_text in ids[~valid & (ids != '')]:  # Lines without an id are skipped silently
+                print(f"Skipping movie {id_text!r} due to an invalid number")
+
+            for movie_id, id_text, title, genre, release_year, view, rating in zip(
+                    numbers['id'][valid].astype(np.int64), ids[valid], chunk['title'][valid], chunk['genre'][valid],
+                    numbers['release_year'][valid].astype(np.int64), numbers['view'][valid].astype(np.int64),
+                    numbers['rating'][valid].astype(float)):
+                self.movies[int(movie_id)] = {
+                    "id": id_text,
+                    "title": title,
+                    "genre": genre,
+                    "release_year": int(release_year),
+                    "view": int(view),
+                    "rating": float(rating)
+                }
+
+    @instrumented('load_user_data')
+    def load_user_data(self, file_path, chunk_size=100_000, progress=None):
+        if isinstance(self.storage, CsvStorage):
+            self.storage.user_writer.file_path = file_path
+        self.sources['users'] = file_path
+        columns = ['user_id', 'name', 'password', 'age', 'gender']
+        for chunk in _read_csv_chunks(file_path, chunk_size, progress, header=0, names=columns, usecols=range(len(columns)),
+                                      dtype=str, keep_default_na=False):
+            id_text = chunk['user_id'].str.strip()
+            user_ids = pd.to_numeric(id_text, errors='coerce')
+            ages = pd.to_numeric(chunk['age'], errors='coerce')
+            valid = user_ids.notna() & ages.notna()
+            for text in id_text[~valid & (id_text != '')]:  # Lines without an id are skipped silently
+                print(f"Skipping user {text!r} due to an invalid number")
+
+            for user_id, name, password, age, gender in zip(
+                    user_ids[valid].astype(np.int64), chunk['name'][valid], chunk['password'][valid],
+                    ages[valid].astype(np.int64), chunk['gender'][valid]):
+                self.users.add(int(user_id), {
+                    'name': name,
+                    'password': password,
+                    'age': int(age),
+                    'gender': gender,
+                    'ratings': []  # Initialize an empty list for user ratings
+                })
+
+    @instrumented('load_user_ratings')
+    def load_user_ratings(self, file_path, chunk_size=1_000_000, progress=None):
+        # Wide files have one row per user and a column per movie; long files one
+        # user_id,movie_id,rating line per rating
+        self.data_version += 1
+        self.sources['ratings'] = file_path
+        with open(file_path, 'r') as file:
+            header = file.readline().strip().split(',')
+        if 'movie_id' in header:
+            self.rating_matrix = RatingMatrix.from_long_csv(file_path, user_ids=list(self.user_data), movie_ids=list(self.movies),
+                                                            chunk_size=chunk_size, progress=progress)
+            ratings_format = 'long'
+        else:
+            self.rating_matrix = RatingMatrix.from_wide_csv(file_path, chunk_size=chunk_size, progress=progress)
+            ratings_format = 'wide'
+        if isinstance(self.storage, CsvStorage):
+            self.storage.ratings_writer.file_path = file_path
+            self.storage.ratings_format = ratings_format
+            self.storage.wide_movie_count = len(self.rating_matrix.movie_ids)
+
+    @instrumented('load_from_storage')
+    def load_from_storage(self, storage=None, chunk_size=100_000):
+        # Loads movies, users and ratings from a Storage that supports reading (SQLiteStorage)
+        # and persists later changes to it
+        if storage is not None:
+            self.storage = storage
+            self.users.storage = storage
+        self._rankings = None
+        self.data_version += 1
+        if isinstance(self.storage, SQLiteStorage):
+            self.sources['database'] = self.storage.file_path
+        for rows in self.storage.load_movies(chunk_size):
+            for movie_id, title, genre, release_year, view, rating in rows:
+                self.movies[movie_id] = {
+                    "id": str(movie_id),
+                    "title": title,
+                    "genre": genre,
+                    "release_year": release_year,
+                    "view": view,
+                    "rating": rating
+                }
+        for rows in self.storage.load_users(chunk_size):
+            for user_id, name, password, age, gender in rows:
+                self.users.add(user_id, {
+                    'name': name,
+                    'password': password,
+                    'age': age,
+                    'gender': gender,
+                    'ratings': []  # Initialize an empty list for user ratings
+                })
+        users, movies, ratings = [], [], []
+        for chunk_users, chunk_movies, chunk_ratings in self.storage.load_ratings(chunk_size * 10):
+            users.append(chunk_users)
+            movies.append(chunk_movies)
+            ratings.append(chunk_ratings)
+        self.rating_matrix = RatingMatrix.from_triplets(users, movies, ratings, user_ids=list(self.user_data),
+                                                        movie_ids=list(self.movies))
+
+    @instrumented('load_similarity_matrix')
+    def load_similarity_matrix(self, file_path, top_k=5):
+        self.data_version += 1
+        self.item_neighbors = ItemNeighborIndex.from_file(file_path, top_k=top_k)
+        self.sources['similarity'] = file_path
+        if self.item_neighbors.feature_fit is None and self.movies:
+            self._fit_neighbor_features()
+
+    def _fit_neighbor_features(self):
+        # For indexes that do not record their encoding: fit it on the catalog's movies in the
+        # index, once, so that movies added later do not change it
+        df = self._movie_frame(None)
+        self.item_neighbors.feature_fit = self._fit_movie_features(df[df['id'].isin(self.item_neighbors.movie_ids)])
+
+    @instrumented('recommend_movies_based_on_similarity')
+    def recommend_movies_based_on_similarity(self, user_id=None, top_n=5):
+        user_id = self.logged_in_user if user_id is None else user_id
+        if user_id is None:
+            return "Please login first to get recommendations."
 
-        if not rated_movies:
+        movie_ids, scores = self._similar_movies(user_id, top_n)
+        if movie_ids is None:
             return "No valid ratings available for recommendations."
 
-        movie_scores = {}
+        recommended_movies_info = [self.movies[int(movie_id)] for movie_id in movie_ids]
+        return recommended_movies_info
 
-        for movie_id, rating in rated_movies:
-            similar_movies = self.similarity_matrix.loc[movie_id].nlargest(6).index.tolist()
-            similar_movies.remove(str(movie_id))  # Remove the movie itself from the list
+    def _similar_movies(self, user_id, top_n):
+        movie_ids, ratings = self.rating_matrix.user_row(user_id)
 
-            for similar_movie_id in similar_movies:
-                similar_movie_id = int(similar_movie_id)
-                if similar_movie_id in movie_scores:
-                    movie_scores[similar_movie_id] += self.similarity_matrix.loc[movie_id, str(similar_movie_id)] * rating
-                else:
-                    movie_scores[similar_movie_id] = self.similarity_matrix.loc[movie_id, str(similar_movie_id)] * rating
+        # Collect all movies rated by the user with a rating from 1 to 10
+        valid = (ratings >= 1) & (ratings <= 10)
+        if not valid.any():
+            return None, None
 
-        recommended_movies = sorted(movie_scores.items(), key=lambda x: x[1], reverse=True)[:5]
-        recommended_movies_info = [self.movies[movie_id] for movie_id, score in recommended_movies]
-        return recommended_movies_info
+        with metrics.timer('item_item.scoring'):
+            candidate_ids, scores = self.item_neighbors.score_movies(movie_ids[valid], ratings[valid], neighbors_per_movie=5)
+        metrics.observe('candidate_set_size', len(candidate_ids))
+        with metrics.timer('item_item.top_n'):
+            best = _top_k_indices(scores, top_n)
+        return candidate_ids[best], scores[best]
 
     def new_user_recommendations(self):
-        sorted_movies_by_rating = sorted(self.movies.values(), key=lambda x: x["rating"], reverse=True)
-        top_rated_movies = sorted_movies_by_rating[:5]
-
-        sorted_movies_by_views = sorted(self.movies.values(), key=lambda x: x["view"], reverse=True)
-        hot_movies = sorted_movies_by_views[:2]
+        top_rated_movies = [self.movies[movie_id] for movie_id in self.rankings.top_by_rating(5)]
+        hot_movies = [self.movies[movie_id] for movie_id in self.rankings.top_by_views(2)]
 
         recommendations = top_rated_movies + hot_movies
         return recommendations
 
-    def existing_user_recommendations(self):
-        if self.logged_in_user is None:
+    @instrumented('existing_user_recommendations')
+    def existing_user_recommendations(self, user_id=None, top_n=5):
+        user_id = self.logged_in_user if user_id is None else user_id
+        if user_id is None:
             return "Please login first to get recommendations."
 
-        user_ratings = self.user_ratings[self.logged_in_user]
-        rated_movies = [(movie_id, rating) for movie_id, rating in enumerate(user_ratings, start=1) if rating > 0]
-        top_rated_movies = sorted(rated_movies, key=lambda x: x[1], reverse=True)[:5]
-        
-        recommendations = [self.movies[movie_id] for movie_id, rating in top_rated_movies]
+        movie_ids, ratings = self._top_rated_movies(user_id, top_n)
+        recommendations = [self.movies[int(movie_id)] for movie_id in movie_ids]
         return recommendations
 
-    def find_similar_users(self, user_id):
-        target_ratings = self.user_ratings[user_id]
-        similarities = []
-
-        for other_user_id, ratings in self.user_ratings.items():
-            if other_user_id != user_id:
-                similarity = self.calculate_similarity(target_ratings, ratings)
-                similarities.append((other_user_id, similarity))
+    def _top_rated_movies(self, user_id, top_n):
+        movie_ids, ratings = self.rating_matrix.user_row(user_id)
+        best = _top_k_indices(ratings, top_n)
+        return movie_ids[best], ratings[best]
 
-        similarities.sort(key=lambda x: x[1], reverse=True)
-        similar_users = [user for user, similarity in similarities[:5]]  # Top 5 similar users
+    def find_similar_users(self, user_id):
+        rows, similarities = self._nearest_user_rows(user_id)
+        similar_users = [int(user) for user in self.rating_matrix.user_ids[rows]]  # Top 5 similar users
         return similar_users
 
+    def _nearest_user_rows(self, user_id, k=5):
+        with metrics.timer('user_user.similarity'):
+            similarities = self.rating_matrix.user_similarities(user_id)
+        with metrics.timer('user_user.neighbors'):
+            similarities[self.rating_matrix.user_index[user_id]] = -np.inf  # Never pick the user itself
+            rows = _top_k_indices(similarities, min(k, len(similarities) - 1))
+        return rows, similarities[rows]
+
     def calculate_similarity(self, user_ratings, other_user_ratings):
         user_ratings = np.array(user_ratings)
         other_user_ratings = np.array(other_user_ratings)
@@ -147,36 +1683,394 @@ class MovieRecommendationSystem:
         other_user_ratings = other_user_ratings[mask]
         return 1 - cosine(user_ratings, other_user_ratings)  # Cosine similarity
 
-    def predict_user_ratings(self):
-        if self.logged_in_user is None:
+    @instrumented('predict_user_ratings')
+    def predict_user_ratings(self, user_id=None, top_n=5):
+        user_id = self.logged_in_user if user_id is None else user_id
+        if user_id is None:
             return "Please login first to get predictions."
 
-        similar_users = self.find_similar_users(self.logged_in_user)
-        user_ratings = self.user_ratings[self.logged_in_user]
-
-        predictions = {}
-        for movie_id in range(1, len(self.movies) + 1):
-            if user_ratings[movie_id - 1] == 0:
-                total_similarity = 0
-                weighted_sum = 0
-
-                for similar_user in similar_users:
-                    similarity = self.calculate_similarity(user_ratings, self.user_ratings[similar_user])
-                    weighted_sum += similarity * self.user_ratings[similar_user][movie_id - 1]
-                    total_similarity += similarity
+        movie_ids, predicted_ratings = self._predicted_movies([user_id], top_n)[0]
+        recommended_movies = [self.movies[int(movie_id)] for movie_id in movie_ids]
+        return recommended_movies
 
-                if total_similarity > 0:
-                    predicted_rating = weighted_sum / total_similarity
-                else:
-                    predicted_rating = 0  # No similar user ratings available
+    @instrumented('train_als_model')
+    def train_als_model(self, factors=20, regularization=0.1, iterations=10, workers=None):
+        self.als_model = ALSModel.train(self.rating_matrix, factors=factors, regularization=regularization,
+                                        iterations=iterations, workers=workers)
+        self.data_version += 1
+        return self.als_model
+
+    def load_als_model(self, file_path):
+        self.als_model = ALSModel.load(file_path)
+        self.data_version += 1
+        self.sources['als_model'] = file_path
+
+    SNAPSHOT_VERSION = 1
+
+    @instrumented('save_snapshot')
+    def save_snapshot(self, file_path):
+        # Writes the loaded and derived state (catalog, users, rating matrix, neighbour index,
+        # ALS factors) as one 'snapshot' artifact. The header records a CRC32 per array and
+        # the size and mtime of every source file, so restore_snapshot can refuse stale state.
+        self.storage.flush()
+        movie_ids = list(self.movies)
+        user_ids = list(self.user_data)
+        matrix = self.rating_matrix.matrix
+        arrays = {
+            'movie_ids': np.array(movie_ids, dtype=np.int64),
+            'movie_release_year': np.array([self.movies[movie_id]['release_year'] for movie_id in movie_ids], dtype=np.int64),
+            'movie_view': np.array([self.movies[movie_id]['view'] for movie_id in movie_ids], dtype=np.int64),
+            'movie_rating': np.array([self.movies[movie_id]['rating'] for movie_id in movie_ids], dtype=np.float64),
+            'user_ids': np.array(user_ids, dtype=np.int64),
+            'user_age': np.array([self.user_data[user_id]['age'] for user_id in user_ids], dtype=np.int64),
+            'ratings_user_ids': self.rating_matrix.user_ids,
+            'ratings_movie_ids': self.rating_matrix.movie_ids,
+            'ratings_indptr': matrix.indptr.astype(np.int64),
+            'ratings_indices': matrix.indices.astype(np.int32),
+            'ratings_data': matrix.data,
+        }
+        for name, field in [('movie_id_text', 'id'), ('movie_title', 'title'), ('movie_genre', 'genre')]:
+            arrays[name], arrays[name + '_offsets'] = _pack_strings(self.movies[movie_id][field] for movie_id in movie_ids)
+        for name, field in [('user_name', 'name'), ('user_password', 'password'), ('user_gender', 'gender')]:
+            arrays[name], arrays[name + '_offsets'] = _pack_strings(self.user_data[user_id][field] for user_id in user_ids)
+        if self.item_neighbors is not None:
+            arrays['neighbor_movie_ids'] = self.item_neighbors.movie_ids
+            arrays['neighbor_rows'] = self.item_neighbors.neighbors
+            arrays['neighbor_scores'] = self.item_neighbors.scores
+        if self.als_model is not None:
+            arrays['als_user_ids'] = self.als_model.user_ids
+            arrays['als_movie_ids'] = self.als_model.movie_ids
+            arrays['als_user_factors'] = self.als_model.user_factors
+            arrays['als_item_factors'] = self.als_model.item_factors
+        arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+
+        write_artifact(file_path, 'snapshot', arrays, meta={
+            'version': self.SNAPSHOT_VERSION,
+            'checksums': {name: zlib.crc32(array) for name, array in arrays.items()},
+            'sources': {name: [os.path.abspath(path), _source_fingerprint(name, path)] for name, path in self.sources.items()},
+            'next_user_id': self.users.next_id,
+            'prediction_engine': self.prediction_engine,
+            'feature_fit': self.item_neighbors.feature_fit if self.item_neighbors is not None else None,
+            'ratings_format': getattr(self.storage, 'ratings_format', None),
+            'wide_movie_count': getattr(self.storage, 'wide_movie_count', None),
+        })
+
+    @instrumented('restore_snapshot')
+    def restore_snapshot(self, file_path, verify=True, sources=None):
+        # Replaces the in-memory state with a snapshot written by save_snapshot. Raises ValueError
+        # if the snapshot is corrupt, from another version, or any source changed since. sources
+        # optionally maps source names ('movies', 'similarity', 'als_model', ...) to the paths the
+        # caller would load; the snapshot must have been built from exactly those (None: absent).
+        meta, arrays = open_artifact(file_path, kind='snapshot')
+        if meta.get('version') != self.SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported snapshot version {meta.get('version')} in {file_path}.")
+        for name, path in (sources or {}).items():
+            recorded = meta['sources'].get(name, [None])[0]
+            expected = os.path.abspath(path) if path else None
+            if recorded != expected:
+                raise ValueError(f"Snapshot {file_path} was built with {name} {recorded}, not {expected}.")
+        for name, (path, fingerprint) in meta['sources'].items():
+            if _source_fingerprint(name, path) != fingerprint:
+                raise ValueError(f"Snapshot {file_path} is stale: {path} changed since it was written.")
+        if verify:
+            for name, checksum in meta['checksums'].items():
+                if zlib.crc32(arrays[name]) != checksum:
+                    raise ValueError(f"Snapshot {file_path} is corrupt: checksum mismatch in '{name}'.")
+
+        movie_fields = [_unpack_strings(arrays[name], arrays[name + '_offsets'])
+                        for name in ('movie_id_text', 'movie_title', 'movie_genre')]
+        self.movies = {
+            movie_id: {
+                "id": id_text,
+                "title": title,
+                "genre": genre,
+                "release_year": release_year,
+                "view": view,
+                "rating": rating
+            }
+            for movie_id, id_text, title, genre, release_year, view, rating in zip(
+                arrays['movie_ids'].tolist(), *movie_fields, arrays['movie_release_year'].tolist(),
+                arrays['movie_view'].tolist(), arrays['movie_rating'].tolist())
+        }
 
-                predictions[movie_id] = predicted_rating
+        self.users = UserStore(self.storage)
+        self.user_data = self.users.users
+        user_fields = [_unpack_strings(arrays[name], arrays[name + '_offsets'])
+                       for name in ('user_name', 'user_password', 'user_gender')]
+        for user_id, name, password, age, gender in zip(arrays['user_ids'].tolist(), user_fields[0], user_fields[1],
+                                                        arrays['user_age'].tolist(), user_fields[2]):
+            self.users.add(user_id, {
+                'name': name,
+                'password': password,
+                'age': age,
+                'gender': gender,
+                'ratings': []  # Initialize an empty list for user ratings
+            })
+        self.users.next_id = meta['next_user_id']
+
+        # The rating matrix is edited in place later, so it is copied out of the read-only mapping
+        user_ids, movie_ids = arrays['ratings_user_ids'], arrays['ratings_movie_ids']
+        matrix = csr_matrix((np.array(arrays['ratings_data']), np.array(arrays['ratings_indices']),
+                             np.array(arrays['ratings_indptr'])), shape=(len(user_ids), len(movie_ids)))
+        self.rating_matrix = RatingMatrix(user_ids, movie_ids, matrix)
+
+        self.item_neighbors = None
+        if 'neighbor_movie_ids' in arrays:
+            self.item_neighbors = ItemNeighborIndex(arrays['neighbor_movie_ids'], arrays['neighbor_rows'],
+                                                    arrays['neighbor_scores'], meta.get('feature_fit'))
+        self.als_model = None
+        if 'als_user_ids' in arrays:
+            self.als_model = ALSModel(arrays['als_user_ids'], arrays['als_movie_ids'], arrays['als_user_factors'],
+                                      arrays['als_item_factors'])
+        self.prediction_engine = meta['prediction_engine']
+
+        self.sources = {name: path for name, (path, fingerprint) in meta['sources'].items()}
+        if isinstance(self.storage, CsvStorage):
+            self.storage.user_writer.file_path = self.sources.get('users', self.storage.user_writer.file_path)
+            self.storage.ratings_writer.file_path = self.sources.get('ratings', self.storage.ratings_writer.file_path)
+            self.storage.ratings_format = meta['ratings_format'] or 'wide'
+            self.storage.wide_movie_count = meta['wide_movie_count'] or 0
+        self._rankings = None
+        self.data_version += 1
+
+    def set_prediction_engine(self, engine):
+        # 'user_user' (neighbourhood collaborative filtering) or 'als' (matrix factorization)
+        if engine not in ('user_user', 'als'):
+            raise ValueError(f"Unknown prediction engine: {engine}")
+        if engine == 'als' and self.als_model is None:
+            raise ValueError("Train or load an ALS model before selecting the 'als' engine.")
+        self.prediction_engine = engine
+        self.data_version += 1
+
+    def _predicted_movies(self, user_ids, top_n, neighbors=5):
+        if self.prediction_engine == 'als':
+            # Users that joined after training fall back to user-user filtering
+            results = {}
+            fallback = [user_id for user_id in user_ids if user_id not in self.als_model]
+            for user_id, result in zip(fallback, self._user_user_predicted_movies(fallback, top_n, neighbors)):
+                results[user_id] = result
+            for user_id in user_ids:
+                if user_id in self.als_model:
+                    results[user_id] = self.als_model.recommend(user_id, self.rating_matrix.user_row(user_id)[0], top_n)
+            return [results[user_id] for user_id in user_ids]
+        return self._user_user_predicted_movies(user_ids, top_n, neighbors)
+
+    def _user_user_predicted_movies(self, user_ids, top_n, neighbors=5):
+        # User-user collaborative filtering for a block of users: the top `neighbors` most similar
+        # users of each user, then a similarity-weighted average of their ratings for every
+        # movie the user has not rated. Returns one (movie_ids, predicted_ratings) pair per user.
+        if not user_ids:
+            return []
+        matrix = self.rating_matrix
+        rows = np.array([matrix.user_index[user_id] for user_id in user_ids], dtype=np.int64)
+        with metrics.timer('user_user.similarity'):
+            similarities = matrix.block_similarities(rows)
+
+        with metrics.timer('user_user.neighbors'):
+            weight_rows, weight_cols, weight_data = [], [], []
+            total_similarities = np.zeros(len(rows))
+            for i, row in enumerate(rows):
+                start, end = similarities.indptr[i], similarities.indptr[i + 1]
+                others, values = similarities.indices[start:end], similarities.data[start:end]
+                values = np.where(others == row, -np.inf, values)  # Never pick the user itself
+                best = _top_k_indices(values, min(neighbors, np.count_nonzero(others != row)))
+                total_similarity = values[best].sum()
+                if total_similarity > 0:  # Otherwise no similar user ratings are available
+                    weight_rows.append(np.full(len(best), i))
+                    weight_cols.append(others[best])
+                    weight_data.append(values[best])
+                    total_similarities[i] = total_similarity
+
+        with metrics.timer('user_user.scoring'):
+            weights = csr_matrix((np.concatenate(weight_data) if weight_data else np.empty(0),
+                                  (np.concatenate(weight_rows) if weight_rows else np.empty(0, dtype=np.int64),
+                                   np.concatenate(weight_cols) if weight_cols else np.empty(0, dtype=np.int64))),
+                                 shape=(len(rows), len(matrix.user_ids)))
+            predictions = weights @ matrix.matrix
+            predictions.sort_indices()
+            predictions.data /= np.repeat(total_similarities, np.diff(predictions.indptr))
+
+        with metrics.timer('user_user.top_n'):
+            results = []
+            for i, row in enumerate(rows):
+                rated = matrix.matrix.indices[matrix.matrix.indptr[row]:matrix.matrix.indptr[row + 1]]
+                start, end = predictions.indptr[i], predictions.indptr[i + 1]
+                candidates, values = predictions.indices[start:end], predictions.data[start:end]
+                unrated = ~np.isin(candidates, rated)
+                candidates, values = candidates[unrated], values[unrated]
+                metrics.observe('candidate_set_size', len(candidates))
+
+                best = _top_k_indices(values, top_n)
+                columns, predicted = candidates[best], values[best]
+                if len(columns) < top_n:
+                    # Fill up with unrated movies predicted at 0, in catalog order
+                    window = np.arange(min(len(matrix.movie_ids), top_n + len(rated) + len(columns)))
+                    padding = np.setdiff1d(window, np.concatenate([rated, columns]), assume_unique=False)[:top_n - len(columns)]
+                    columns = np.concatenate([columns, padding])
+                    predicted = np.concatenate([predicted, np.zeros(len(padding))])
+                results.append((matrix.movie_ids[columns], predicted))
+        return results
+
+    def recommend_movie_ids(self, user_ids, method='predict_user_ratings', top_n=5):
+        # (movie_ids, scores) per user for one of the per-user recommendation methods
+        if method == 'predict_user_ratings':
+            return self._predicted_movies(user_ids, top_n)
+        if method == 'recommend_movies_based_on_similarity':
+            results = [self._similar_movies(user_id, top_n) for user_id in user_ids]
+            return [(np.empty(0, dtype=np.int64), np.empty(0)) if movie_ids is None else (movie_ids, scores)
+                    for movie_ids, scores in results]
+        if method == 'existing_user_recommendations':
+            return [self._top_rated_movies(user_id, top_n) for user_id in user_ids]
+        raise ValueError(f"Unknown recommendation method: {method}")
+
+    @instrumented('batch_recommendations')
+    def batch_recommendations(self, output_file, user_ids=None, method='predict_user_ratings', top_n=10,
+                              shard_size=256, workers=None):
+        # Offline job: top-N recommendations for every user (or the given ones), sharded across a
+        # process pool and written to a binary artifact that BatchRecommendations searches by user
+        # id in O(log users). Rows are stored in user id order.
+        if user_ids is None:
+            user_ids = self.rating_matrix.user_ids
+        user_ids = np.unique(np.asarray(user_ids, dtype=np.int64))
+        shards = [user_ids[start:start + shard_size].tolist() for start in range(0, len(user_ids), shard_size)]
+        workers = workers or os.cpu_count() or 1
+
+        with create_artifact(output_file, 'batch_recommendations', {
+            'user_ids': (np.int64, (len(user_ids),)),
+            'movie_ids': (np.int64, (len(user_ids), top_n)),
+            'scores': (np.float32, (len(user_ids), top_n)),
+        }, meta={'method': method, 'top_n': top_n, 'prediction_engine': self.prediction_engine,
+                 'sorted_user_ids': True}) as arrays:
+            arrays['user_ids'][:] = user_ids
+
+            if workers == 1:
+                _init_batch_worker(self)
+                results = (_batch_shard(shard, method, top_n) for shard in shards)
+                executor = None
+            else:
+                executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_batch_worker,
+                                               initargs=(self, metrics.enabled))
+                results = executor.map(_batch_shard, shards, [method] * len(shards), [top_n] * len(shards))
+            try:
+                start = 0
+                for movie_ids, scores, worker_metrics in results:
+                    if worker_metrics is not None:
+                        metrics.merge(worker_metrics)
+                    arrays['movie_ids'][start:start + len(movie_ids)] = movie_ids
+                    arrays['scores'][start:start + len(scores)] = scores
+                    start += len(movie_ids)
+            finally:
+                if executor is not None:
+                    executor.shutdown()
+
+    def load_batch_recommendations(self, file_path):
+        # get_recommendations answers from the loaded file for the recommendation type it covers
+        self.data_version += 1
+        batch = BatchRecommendations.load(file_path)
+        self.precomputed[batch.method] = batch
+
+    def precomputed_recommendations(self, user_id, method='predict_user_ratings', top_n=None):
+        # Movie infos from a loaded batch file, or None when it cannot answer: the user is not in
+        # it or rated movies since it was loaded, it holds fewer than top_n movies per user, or it
+        # was scored by another prediction engine
+        batch = self.precomputed.get(method)
+        if batch is None or user_id in batch.stale_users or (top_n is not None and top_n > batch.top_n):
+            return None
+        if method == 'predict_user_ratings' and batch.prediction_engine not in (None, self.prediction_engine):
+            return None
+        found = batch.lookup(user_id)
+        if found is None:
+            return None
+        return [self.movies[int(movie_id)] for movie_id in found[0][:top_n]]
+
+    def rate_movie(self, user_id, movie_id, rating):
+        # Applies a single rating (0 removes it) to the in-memory model without a reload
+        if movie_id not in self.movies:
+            raise ValueError(f"Unknown movie: {movie_id}")
+        if not 0 <= rating <= 10:
+            raise ValueError("Rating must be between 0 and 10.")
+        if user_id not in self.rating_matrix:
+            self.rating_matrix.add_user(user_id)
+        self.rating_matrix.set_rating(user_id, movie_id, rating)
+        self.storage.save_ratings([(user_id, movie_id, rating)])
+        self.data_version += 1
+        for batch in self.precomputed.values():
+            batch.stale_users.add(user_id)
+
+    def add_movie(self, movie_id, title, genre, release_year, view=0, rating=0.0):
+        # Adds a movie to the catalog, the rating matrix and the neighbour index. Only the new
+        # movie's similarities are computed (O(catalog)), not the full similarity matrix.
+        # A new genre is encoded as no genre until the index is rebuilt.
+        if movie_id in self.movies:
+            raise ValueError(f"Movie {movie_id} already exists.")
+        self.data_version += 1
+        self.movies[movie_id] = {
+            "id": str(movie_id),
+            "title": title,
+            "genre": genre,
+            "release_year": int(release_year),
+            "view": int(view),
+            "rating": float(rating)
+        }
+        self.storage.save_movie(movie_id, self.movies[movie_id])
+        if self._rankings is not None:
+            self._rankings.update_movie(movie_id, self.movies[movie_id])
+        if movie_id not in self.rating_matrix.movie_index:
+            self.rating_matrix.add_movie(movie_id)
+
+        if self.item_neighbors is not None:
+            # Encoded and scaled as when the index was built; a movie outside the catalog's year or
+            # rating range must not rescale the features the existing neighbour rows came from
+            if self.item_neighbors.feature_fit is None:
+                self._fit_neighbor_features()
+            catalog_ids, features, _ = self.movie_features(None, fit=self.item_neighbors.feature_fit)
+            features = normalize(features)
+            rows = pd.Index(catalog_ids).get_indexer(self.item_neighbors.movie_ids)
+            similarities = np.where(rows >= 0, features[rows] @ features[catalog_ids == movie_id][0], 0.0)
+            self.item_neighbors.add_movie(movie_id, similarities)
+
+    def update_movie(self, movie_id, view=None, rating=None):
+        # Changes a movie's view count and/or catalog rating and moves it in the rankings
+        movie_info = self.movies[movie_id]
+        self.data_version += 1
+        if view is not None:
+            movie_info["view"] = int(view)
+        if rating is not None:
+            movie_info["rating"] = float(rating)
+        self.storage.save_movie(movie_id, movie_info)
+        if self._rankings is not None:
+            self._rankings.update_movie(movie_id, movie_info)
+
+    @instrumented('get_recommendations')
+    def get_recommendations(self, user_id, recommendation_type="based_predict_user_ratings", top_n=5):
+        # Cached entry point for the per-user recommendation methods
+        if recommendation_type not in self.RECOMMENDATION_TYPES:
+            raise ValueError(f"Unknown recommendation type: {recommendation_type}")
+        metrics.count(f"recommendations_{recommendation_type}")
+        key = (user_id, recommendation_type, top_n, self.data_version)
+        recommendations = self.cache.get(key)
+        if recommendations is not None:
+            return list(recommendations)
+
+        method = self.BATCH_METHODS.get(recommendation_type)
+        recommendations = self.precomputed_recommendations(user_id, method, top_n) if method in self.precomputed else None
+        if recommendations is not None:
+            metrics.count('precomputed_hits')
+        elif recommendation_type == "based_predict_user_ratings":
+            recommendations = self.predict_user_ratings(user_id, top_n)
+        elif recommendation_type == "based_on_gender":
+            recommendations = self.get_gender_based_recommendations(self.user_data[user_id]['gender'], top_n)
+        elif recommendation_type == "based_on_similarity":
+            recommendations = self.recommend_movies_based_on_similarity(user_id, top_n)
+            if isinstance(recommendations, str):  # No valid ratings to start from
+                recommendations = []
+        else:
+            recommendations = self.existing_user_recommendations(user_id, top_n)
 
-        sorted_predictions = sorted(predictions.items(), key=lambda x: x[1], reverse=True)
-        recommended_movies = [self.movies[movie_id] for movie_id, rating in sorted_predictions[:5]]
-        return recommended_movies
+        self.cache.put(key, tuple(recommendations))
+        return recommendations
 
-    def get_gender_based_recommendations(self, gender):
+    def get_gender_based_recommendations(self, gender, top_n=5):
         if gender.lower() == 'male':
             preferred_genres = ['Action', 'Adventure', 'Crime', 'Horror']
         elif gender.lower() == 'female':
@@ -184,82 +2078,294 @@ class MovieRecommendationSystem:
         else:
             return []
 
-        genre_movies = [movie for movie in self.movies.values() if any(genre in movie["genre"] for genre in preferred_genres)]
-        top_genre_movies = sorted(genre_movies, key=lambda x: x["rating"], reverse=True)
-        return top_genre_movies[:5]
+        return [self.movies[movie_id] for movie_id in self.rankings.top_by_rating(top_n, genres=preferred_genres)]
 
-    def generate_similarity_matrix(self, movie_data_file='data.csv', output_file='movie_similarity_matrix.csv'):
-        df = pd.read_csv(movie_data_file)
-        
+    def _movie_frame(self, movie_data_file):
+        # The catalog read from movie_data_file, or the loaded movies when it is None
+        if movie_data_file is None:
+            df = pd.DataFrame(list(self.movies.values()))
+            df['id'] = list(self.movies.keys())
+        else:
+            df = pd.read_csv(movie_data_file)
+            # data.csv has an unnamed id column and a capitalised 'Genre' header
+            df = df.rename(columns=lambda column: 'id' if column.startswith('Unnamed') else column.lower())
+            df = df.dropna(subset=['id'])
         # Remove the 'view' column because it is not used to calculate similarity
         df = df.drop(columns=['view'])
+        df['genre'] = df['genre'].astype(str)
+        return df
+
+    @staticmethod
+    def _fit_movie_features(df):
+        # The feature encoding as plain JSON values: genre categories, the median year that
+        # stands in for unknown years, and the year and rating ranges scaled to [0, 1]
+        years = df['release_year'].replace(UNKNOWN_RELEASE_YEAR, np.nan)
+        median_year = float(years.median()) if years.notna().any() else UNKNOWN_RELEASE_YEAR
+        years = years.fillna(median_year)
+        return {
+            'genres': sorted(df['genre'].unique().tolist()),
+            'median_year': median_year,
+            'release_year': [float(years.min()), float(years.max())],
+            'rating': [float(df['rating'].min()), float(df['rating'].max())],
+        }
+
+    def movie_features(self, movie_data_file='data.csv', fit=None):
+        # Features of every movie in the catalog (see _movie_frame), encoded with fit or, when it is
+        # None, with an encoding fitted on this catalog. Returns (movie_ids, features, fit).
+        df = self._movie_frame(movie_data_file)
+        fit = fit or self._fit_movie_features(df)
+
+        # Movies without a known year are placed at the median year rather than at year 0
+        years = df['release_year'].replace(UNKNOWN_RELEASE_YEAR, np.nan).fillna(fit['median_year'])
         # Encoding the 'genre' Column
-        encoder = OneHotEncoder(sparse_output=False)
-        genre_encoded = encoder.fit_transform(df[['genre']])
+        encoder = OneHotEncoder(categories=[fit['genres']], sparse_output=False, handle_unknown='ignore')
+        genre_encoded = encoder.fit(pd.DataFrame({'genre': fit['genres']})).transform(df[['genre']])
 
         # Scaling the 'release_year' and 'rating' Columns
-        scaler = MinMaxScaler()
-        release_year_scaled = scaler.fit_transform(df[['release_year']])
-        rating_scaled = scaler.fit_transform(df[['rating']])
+        release_year_scaled = MinMaxScaler().fit(np.reshape(fit['release_year'], (-1, 1))).transform(
+            years.to_numpy(dtype=float).reshape(-1, 1))
+        rating_scaled = MinMaxScaler().fit(np.reshape(fit['rating'], (-1, 1))).transform(
+            df['rating'].to_numpy(dtype=float).reshape(-1, 1))
 
         # Combining Features
         features = np.hstack([genre_encoded, release_year_scaled, rating_scaled])
+        return df['id'].astype(np.int64).to_numpy(), features, fit
+
+    @instrumented('generate_similarity_matrix')
+    def generate_similarity_matrix(self, movie_data_file='data.csv', output_file='movie_similarity_matrix.csv',
+                                   top_k=None, block_size=None, workers=None):
+        movie_ids, features, fit = self.movie_features(movie_data_file)
+
+        if top_k is not None:
+            self._generate_neighbors(movie_ids, features, output_file, top_k, block_size, workers, fit)
+            return
+
         # Calculating the Cosine Similarity Matrix
         similarity_matrix = cosine_similarity(features) # type: ignore
 
         # Creating a DataFrame for the Similarity Matrix
-        similarity_df = pd.DataFrame(similarity_matrix, index=df['id'], columns=df['id'])
+        similarity_df = pd.DataFrame(similarity_matrix, index=pd.Index(movie_ids, name='id'), columns=movie_ids)
 
         # Save to CSV file
         similarity_df.to_csv(output_file)
 
+    def _generate_neighbors(self, movie_ids, features, output_file, top_k, block_size, workers, fit=None):
+        # Splits the catalog into row blocks, scores each block against the whole catalog on a
+        # process pool and streams every block's top-K neighbours to disk as soon as it is done.
+        # A .csv output gets the long text format, anything else the binary artifact format.
+        features = normalize(features).astype(np.float32)
+        block_size = block_size or _similarity_block_size(len(movie_ids))
+        starts = range(0, len(movie_ids), block_size)
+        workers = workers or os.cpu_count() or 1
+        k = min(top_k, len(movie_ids) - 1)
+
+        with contextlib.ExitStack() as stack:
+            if output_file.endswith('.csv'):
+                file = stack.enter_context(open(output_file, 'w'))
+                file.write('movie_id,neighbor_id,score\n')
+
+                def write_block(start, neighbors, scores):
+                    block_ids = np.repeat(movie_ids[start:start + len(neighbors)], neighbors.shape[1])
+                    rows = np.column_stack([block_ids, movie_ids[neighbors.ravel()], scores.ravel()])
+                    np.savetxt(file, rows, fmt='%d,%d,%.7g')
+            else:
+                arrays = stack.enter_context(create_artifact(output_file, 'item_neighbors', {
+                    'movie_ids': (np.int64, (len(movie_ids),)),
+                    'neighbors': (np.int32, (len(movie_ids), k)),
+                    'scores': (np.float32, (len(movie_ids), k)),
+                }, meta={'feature_fit': fit}))
+                arrays['movie_ids'][:] = movie_ids
+
+                def write_block(start, neighbors, scores):
+                    arrays['neighbors'][start:start + len(neighbors)] = neighbors
+                    arrays['scores'][start:start + len(scores)] = scores
+
+            if workers == 1:
+                _init_similarity_worker(features, top_k)
+                for start in starts:
+                    write_block(start, *_similarity_block(start, block_size))
+            else:
+                with ProcessPoolExecutor(max_workers=workers, initializer=_init_similarity_worker,
+                                         initargs=(features, top_k)) as executor:
+                    blocks = executor.map(_similarity_block, starts, [block_size] * len(starts))
+                    for start, (neighbors, scores) in zip(starts, blocks):
+                        write_block(start, neighbors, scores)
+
+
+class RecommendationServer:
+    # Minimal HTTP/1.1 JSON service on asyncio streams. Every request names its user, so any
+    # number of users are served concurrently; scoring runs on a thread or process pool while
+    # the event loop keeps accepting connections.
+    #
+    #   GET  /recommendations/<type>?user_id=1&top_n=5
+    #   POST /recommendations/<type>/batch   {"user_ids": [1, 2], "top_n": 5}
+    #   GET  /recommendations/new_user
+    #   GET  /health, GET /stats, GET /metrics (Prometheus text)
+    def __init__(self, movie_system, host='127.0.0.1', port=8080, workers=None, executor='thread'):
+        self.movie_system = movie_system
+        self.host = host
+        self.port = port
+        self.workers = workers or os.cpu_count() or 1
+        if executor == 'process':
+            self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_batch_worker,
+                                                initargs=(movie_system,))
+            self.compute = _serve_recommendations
+        else:
+            self.executor = ThreadPoolExecutor(max_workers=self.workers)
+            self.compute = self._recommendations_for
+
+    def _recommendations_for(self, user_ids, recommendation_type, top_n):
+        return [self.movie_system.get_recommendations(user_id, recommendation_type, top_n) for user_id in user_ids]
+
+    async def _run(self, user_ids, recommendation_type, top_n):
+        # Splits the users into one chunk per worker and gathers the results in order
+        loop = asyncio.get_running_loop()
+        size = max(1, -(-len(user_ids) // self.workers))
+        chunks = [user_ids[start:start + size] for start in range(0, len(user_ids), size)]
+        results = await asyncio.gather(*(loop.run_in_executor(self.executor, self.compute, chunk, recommendation_type, top_n)
+                                         for chunk in chunks))
+        return [recommendations for chunk in results for recommendations in chunk]
+
+    async def handle(self, method, path, query, body):
+        parts = [part for part in path.split('/') if part]
+        if method == 'GET' and parts == ['health']:
+            return HTTPStatus.OK, {'status': 'ok', 'data_version': self.movie_system.data_version}
+        if method == 'GET' and parts == ['stats']:
+            # With the process executor every worker keeps its own cache; this is the server process's
+            return HTTPStatus.OK, {'cache': self.movie_system.cache.stats()}
+        if method == 'GET' and parts == ['metrics']:
+            return HTTPStatus.OK, PrometheusExporter().format(metrics.snapshot())
+        if method == 'GET' and parts == ['recommendations', 'new_user']:
+            return HTTPStatus.OK, {'movies': self.movie_system.new_user_recommendations()}
+        if not parts or parts[0] != 'recommendations' or len(parts) not in (2, 3):
+            return HTTPStatus.NOT_FOUND, {'error': f"Unknown path: {path}"}
+
+        recommendation_type = parts[1]
+        if recommendation_type not in self.movie_system.RECOMMENDATION_TYPES:
+            return HTTPStatus.NOT_FOUND, {'error': f"Unknown recommendation type: {recommendation_type}"}
+        try:
+            if len(parts) == 2 and method == 'GET':
+                user_ids = [int(query['user_id'][0])]
+                top_n = int(query.get('top_n', ['5'])[0])
+            elif parts[2:] == ['batch'] and method == 'POST':
+                payload = json.loads(body or b'{}')
+                user_ids = [int(user_id) for user_id in payload['user_ids']]
+                top_n = int(payload.get('top_n', 5))
+            else:
+                return HTTPStatus.NOT_FOUND, {'error': f"Unknown path: {method} {path}"}
+        except (KeyError, ValueError, TypeError) as e:
+            return HTTPStatus.BAD_REQUEST, {'error': f"Invalid request: {e}"}
+        if top_n < 1:
+            return HTTPStatus.BAD_REQUEST, {'error': f"Invalid request: top_n must be at least 1, got {top_n}"}
+
+        # Gender recommendations need the user's profile; a user may have ratings but no profile
+        # (long ratings files) or a profile but no ratings row yet
+        if recommendation_type == 'based_on_gender':
+            known = self.movie_system.user_data
+        else:
+            known = self.movie_system.rating_matrix
+        unknown = [user_id for user_id in user_ids if user_id not in known]
+        if unknown:
+            return HTTPStatus.NOT_FOUND, {'error': f"Unknown users: {unknown}"}
+
+        results = await self._run(user_ids, recommendation_type, top_n)
+        if len(parts) == 2:
+            return HTTPStatus.OK, {'user_id': user_ids[0], 'type': recommendation_type, 'movies': results[0]}
+        return HTTPStatus.OK, {'type': recommendation_type,
+                               'results': {str(user_id): movies for user_id, movies in zip(user_ids, results)}}
+
+    async def _serve_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, target, version = request_line.decode('latin-1').split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get('content-length', 0)))
+
+                url = urlsplit(target)
+                metrics.count('http_requests')
+                try:
+                    with metrics.timer('http_request'):
+                        status, payload = await self.handle(method, url.path, parse_qs(url.query), body)
+                except Exception as e:
+                    status, payload = HTTPStatus.INTERNAL_SERVER_ERROR, {'error': str(e)}
+
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                if isinstance(payload, str):
+                    content, content_type = payload.encode('utf-8'), 'text/plain; version=0.0.4'
+                else:
+                    content, content_type = json.dumps(payload).encode('utf-8'), 'application/json'
+                writer.write((f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                              f"Content-Type: {content_type}\r\n"
+                              f"Content-Length: {len(content)}\r\n"
+                              f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n").encode('latin-1') + content)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ValueError, asyncio.IncompleteReadError, ConnectionError):
+            pass  # Malformed request or client went away
+        finally:
+            writer.close()
+
+    async def serve(self):
+        server = await asyncio.start_server(self._serve_connection, self.host, self.port)
+        print(f"Serving recommendations on http://{self.host}:{self.port}")
+        async with server:
+            await server.serve_forever()
+
+    def run(self):
+        try:
+            asyncio.run(self.serve())
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.executor.shutdown()
+
 
 class UserAuthentication:
     def __init__(self, movie_system):
         self.movie_system = movie_system
 
+    @instrumented('register_user')
     def register_user(self, name, password, age, gender):
         if not name or not password or age is None or gender not in ['Male', 'Female']:
             raise ValueError("All fields must be filled correctly.")
 
-        if any(user_info['name'] == name for user_info in self.movie_system.user_data.values()):
+        users = self.movie_system.users
+        if users.find_by_name(name) is not None:
             raise ValueError("Username already exists.")
 
-        user_id = len(self.movie_system.user_data) + 1
-        with open('user.csv', 'a') as file:
-            file.write(f"\n{user_id},{name},{password},{age},{gender}")
-        
-        self.movie_system.user_data[user_id] = {
-            'name': name,
-            'password': password,
-            'age': age,
-            'gender': gender,
-            'ratings': []  # Initialize an empty list for user ratings
-        }
-        
-        # Initialize the user's ratings to all 0s
-        num_movies = len(self.movie_system.movies)
-        new_user_ratings = [0] * num_movies
-        self.movie_system.user_ratings[user_id] = new_user_ratings
-        
-        with open('ratings.csv', 'a', newline='') as file:
-            writer = csv.writer(file)
-            writer.writerow([user_id] + new_user_ratings)
-        
+        rating_matrix = self.movie_system.rating_matrix
+        min_id = int(rating_matrix.user_ids.max()) + 1 if len(rating_matrix.user_ids) else 1
+        user_id = users.register(name, password, age, gender, min_id=min_id)
+
+        # Initialize the user's ratings to all 0s; raises ValueError rather than handing the new
+        # account another user's ratings
+        rating_matrix.add_user(user_id)
+
         # Log in the user immediately after registration
         self.movie_system.logged_in_user = user_id
         print("Registration successful! You are now logged in.")
 
+    @instrumented('login_user')
     def login_user(self, name, password):
-        for user_id, user_info in self.movie_system.user_data.items():
-            if user_info['name'] == name and user_info['password'] == password:
-                self.movie_system.logged_in_user = user_id
-                return True
+        user_id = self.movie_system.users.find_by_name(name)
+        if user_id is not None and self.movie_system.user_data[user_id]['password'] == password:
+            self.movie_system.logged_in_user = user_id
+            return True
         return False
 
 
 class MovieRecommendationUI:
-    def __init__(self, movie_system):
+    def __init__(self, movie_system, load_data=None):
         self.movie_system = movie_system
         self.user_auth = UserAuthentication(movie_system)  
         self.window = tk.Tk()
@@ -267,8 +2373,50 @@ class MovieRecommendationUI:
         self.window.geometry("600x500")  
         self.window.resizable(False, False) 
 
+        # Slow work runs on one background thread, in submission order, so a login submitted
+        # while the data is still loading simply runs once loading has finished
+        self.worker = ThreadPoolExecutor(max_workers=1)
+        self.pending_tasks = 0
+        self.create_status_widgets()
         self.create_selection_widgets()
 
+        if load_data is not None:
+            self.run_in_background(load_data, self.on_data_loaded, "Loading data...")
+
+    def on_data_loaded(self, error):
+        if isinstance(error, Exception):
+            messagebox.showerror("Loading data", f"Could not load the data: {error}")
+
+    def create_status_widgets(self):
+        self.status_frame = tk.Frame(self.window)
+        self.status_label = tk.Label(self.status_frame, text="", font=("Arial", 11))
+        self.status_label.pack(side=tk.LEFT, padx=10)
+        self.progress_bar = ttk.Progressbar(self.status_frame, mode='indeterminate', length=200)
+        self.status_frame.pack(side=tk.BOTTOM, fill=tk.X, pady=5)
+
+    def run_in_background(self, task, on_done, status="Working..."):
+        # on_done receives the task's result, or the exception it raised, on the Tk main thread
+        future = self.worker.submit(task)
+        self.pending_tasks += 1
+        self.status_label.config(text=status)
+        if self.pending_tasks == 1:
+            self.progress_bar.pack(side=tk.RIGHT, padx=10)
+            self.progress_bar.start(10)
+        self.window.after(50, self._poll_task, future, on_done)
+
+    def _poll_task(self, future, on_done):
+        if not future.done():
+            self.window.after(50, self._poll_task, future, on_done)
+            return
+
+        self.pending_tasks -= 1
+        if self.pending_tasks == 0:
+            self.progress_bar.stop()
+            self.progress_bar.pack_forget()
+            self.status_label.config(text="")
+        error = future.exception()
+        on_done(error if error is not None else future.result())
+
     def create_selection_widgets(self):
         self.selection_frame = tk.Frame(self.window, padx=20, pady=20, bg='lightgray')
 
@@ -350,8 +2498,12 @@ class MovieRecommendationUI:
     def login(self):
         username = self.username_entry.get()
         password = self.password_entry.get()
+        self.run_in_background(lambda: self.user_auth.login_user(username, password), self.on_login, "Logging in...")
 
-        if self.user_auth.login_user(username, password): 
+    def on_login(self, logged_in):
+        if isinstance(logged_in, Exception):
+            messagebox.showerror("Log in", str(logged_in))
+        elif logged_in:
             messagebox.showinfo("Log in", "Log in successfully!")
             self.username_entry.delete(0, tk.END)
             self.password_entry.delete(0, tk.END)
@@ -374,13 +2526,16 @@ class MovieRecommendationUI:
             messagebox.showwarning("Register", "Gender must be 'Male' or 'Female'.")
             return
 
-        try:
-            self.user_auth.register_user(username, password, age, gender)  
-            messagebox.showinfo("Register", "Register successfully! You are logged in now.")
-            self.register_frame.pack_forget()  
-            self.create_recommendations_widgets()  
-        except ValueError as e:
-            messagebox.showerror("Register", str(e))
+        self.run_in_background(lambda: self.user_auth.register_user(username, password, age, gender),
+                               self.on_register, "Registering...")
+
+    def on_register(self, error):
+        if isinstance(error, Exception):
+            messagebox.showerror("Register", str(error))
+            return
+        messagebox.showinfo("Register", "Register successfully! You are logged in now.")
+        self.register_frame.pack_forget()  
+        self.create_recommendations_widgets()  
 
     def create_recommendations_widgets(self):
        # Recommendation section
@@ -409,15 +2564,16 @@ class MovieRecommendationUI:
             messagebox.showwarning("Recommendations", "Please log in before receiving recommendations.")
             return
 
-        if recommendation_type == "based_predict_user_ratings":
-            recommendations = self.movie_system.predict_user_ratings()
-        elif recommendation_type == "based_on_gender":
-            user_gender = self.movie_system.user_data[self.movie_system.logged_in_user]['gender']
-            recommendations = self.movie_system.get_gender_based_recommendations(user_gender)
-        elif recommendation_type == "based_existing_user_recommendations":
-            recommendations = self.movie_system.existing_user_recommendations()
-        else:
-            recommendations = self.movie_system.predict_user_ratings()  # Default if there is no specific recommendation type
+        if recommendation_type not in self.movie_system.RECOMMENDATION_TYPES:
+            recommendation_type = "based_predict_user_ratings"  # Default if there is no specific recommendation type
+        user_id = self.movie_system.logged_in_user
+        self.run_in_background(lambda: self.movie_system.get_recommendations(user_id, recommendation_type),
+                               self.show_recommendations, "Computing recommendations...")
+
+    def show_recommendations(self, recommendations):
+        if isinstance(recommendations, Exception):
+            messagebox.showerror("Recommendations", str(recommendations))
+            return
 
         self.recommendations_list.delete(0, tk.END)
 
@@ -425,16 +2581,160 @@ class MovieRecommendationUI:
             self.recommendations_list.insert(tk.END, f"{movie['title']} - Rating: {movie.get('rating', 'N/A'):.2f}")
 
     def run(self):
-        self.window.mainloop()
+        try:
+            self.window.mainloop()
+        finally:
+            self.worker.shutdown(wait=False, cancel_futures=True)
+
+def convert_similarity_file(input_file, output_file, top_k=None):
+    # Dense or neighbour CSV -> binary, memory-mapped neighbour artifact
+    ItemNeighborIndex.from_file(input_file, top_k=top_k).save(output_file)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Movie Recommendation System")
+    parser.add_argument('--metrics', default=None, help="Record metrics and export them to this file")
+    parser.add_argument('--metrics-format', choices=['jsonl', 'prometheus'], default='jsonl')
+    parser.add_argument('--metrics-interval', type=float, default=None, help="Seconds between exports (default: at exit)")
+    parser.add_argument('--profile', default=None, help="Run the sampling profiler and write collapsed stacks here")
+    parser.add_argument('--profile-interval', type=float, default=0.01)
+    commands = parser.add_subparsers(dest='command')
+
+    convert = commands.add_parser('convert-similarity', help="Convert a similarity CSV to the binary neighbour format")
+    convert.add_argument('input_file')
+    convert.add_argument('output_file')
+    convert.add_argument('--top-k', type=int, default=None)
+
+    build = commands.add_parser('build-similarity', help="Build the top-K neighbour file from the movie data")
+    build.add_argument('movie_data_file')
+    build.add_argument('output_file')
+    build.add_argument('--top-k', type=int, default=20)
+    build.add_argument('--block-size', type=int, default=None,
+                       help="Movies per block (default: as many as fit in 256 MiB per worker)")
+    build.add_argument('--workers', type=int, default=None)
+
+    batch = commands.add_parser('batch-recommend', help="Precompute top-N recommendations for all users")
+    batch.add_argument('output_file')
+    batch.add_argument('--method', default='predict_user_ratings',
+                       choices=['predict_user_ratings', 'recommend_movies_based_on_similarity', 'existing_user_recommendations'])
+    batch.add_argument('--users', type=lambda value: [int(user_id) for user_id in value.split(',')], default=None,
+                       help="Comma separated user ids (default: every user)")
+    batch.add_argument('--top-n', type=int, default=10)
+    batch.add_argument('--shard-size', type=int, default=256)
+    batch.add_argument('--workers', type=int, default=None)
+    batch.add_argument('--movies', default='data.csv')
+    batch.add_argument('--ratings', default='ratings.csv')
+    batch.add_argument('--similarity', default='movie_similarity_matrix.csv')
+
+    batch.add_argument('--als', default=None, help="Use this ALS model for predict_user_ratings")
+
+    als = commands.add_parser('train-als', help="Train the matrix-factorization engine and save its factors")
+    als.add_argument('output_file')
+    als.add_argument('--ratings', default='ratings.csv')
+    als.add_argument('--factors', type=int, default=20)
+    als.add_argument('--regularization', type=float, default=0.1)
+    als.add_argument('--iterations', type=int, default=10)
+    als.add_argument('--workers', type=int, default=None)
+
+    sqlite = commands.add_parser('import-sqlite', help="Import the CSV files into an SQLite database")
+    sqlite.add_argument('database')
+    sqlite.add_argument('--movies', default='data.csv')
+    sqlite.add_argument('--users', default='user.csv')
+    sqlite.add_argument('--ratings', default='ratings.csv')
+
+    serve = commands.add_parser('serve', help="Run the headless HTTP recommendation service")
+    serve.add_argument('--db', default=None, help="Load from and persist to this SQLite database instead of the CSV files")
+    serve.add_argument('--host', default='127.0.0.1')
+    serve.add_argument('--port', type=int, default=8080)
+    serve.add_argument('--workers', type=int, default=None)
+    serve.add_argument('--executor', choices=['thread', 'process'], default='thread')
+    serve.add_argument('--similarity', default='movie_similarity_matrix.csv')
+    serve.add_argument('--als', default=None, help="Use this ALS model for based_predict_user_ratings")
+    serve.add_argument('--snapshot', default=None,
+                       help="Restore from this snapshot if it is still valid, otherwise load normally and write it")
+    serve.add_argument('--batch', action='append', default=[],
+                       help="Answer from this batch-recommend output while it holds the user (repeat for each method)")
+    return parser.parse_args()
+
 
 if __name__ == "__main__":
+    args = parse_args()
+    if args.metrics or args.profile:
+        exporter = None
+        if args.metrics:
+            exporter = PrometheusExporter(args.metrics) if args.metrics_format == 'prometheus' else JsonLinesExporter(args.metrics)
+        metrics.enable(exporter, export_interval=args.metrics_interval,
+                       profile_interval=args.profile_interval if args.profile else None, profile_file=args.profile)
+    if args.command == 'convert-similarity':
+        convert_similarity_file(args.input_file, args.output_file, top_k=args.top_k)
+        raise SystemExit
+    if args.command == 'build-similarity':
+        MovieRecommendationSystem().generate_similarity_matrix(args.movie_data_file, args.output_file, top_k=args.top_k,
+                                                               block_size=args.block_size, workers=args.workers)
+        raise SystemExit
+    if args.command == 'batch-recommend':
+        movie_system = MovieRecommendationSystem()
+        movie_system.load_movie_data(args.movies)
+        movie_system.load_user_ratings(args.ratings)
+        if args.method == 'recommend_movies_based_on_similarity':
+            movie_system.load_similarity_matrix(args.similarity)
+        if args.als:
+            movie_system.load_als_model(args.als)
+            movie_system.set_prediction_engine('als')
+        movie_system.batch_recommendations(args.output_file, user_ids=args.users, method=args.method, top_n=args.top_n,
+                                           shard_size=args.shard_size, workers=args.workers)
+        raise SystemExit
+    if args.command == 'train-als':
+        movie_system = MovieRecommendationSystem()
+        movie_system.load_user_ratings(args.ratings)
+        movie_system.train_als_model(factors=args.factors, regularization=args.regularization,
+                                     iterations=args.iterations, workers=args.workers).save(args.output_file)
+        raise SystemExit
+    if args.command == 'import-sqlite':
+        storage = SQLiteStorage(args.database)
+        storage.import_csv(args.movies, args.users, args.ratings)
+        storage.close()
+        raise SystemExit
+    if args.command == 'serve':
+        movie_system = MovieRecommendationSystem(storage=SQLiteStorage(args.db) if args.db else None)
+        restored = False
+        if args.snapshot and os.path.exists(args.snapshot):
+            if args.db:
+                sources = {'database': args.db}
+            else:
+                sources = {'movies': 'data.csv', 'users': 'user.csv', 'ratings': 'ratings.csv'}
+            sources.update(similarity=args.similarity, als_model=args.als)
+            try:
+                movie_system.restore_snapshot(args.snapshot, sources=sources)
+                restored = True
+            except ValueError as error:
+                print(f"Ignoring snapshot: {error}")
+        if not restored:
+            if args.db:
+                movie_system.load_from_storage()
+            else:
+                movie_system.load_movie_data('data.csv')
+                movie_system.load_user_data('user.csv')
+                movie_system.load_user_ratings('ratings.csv')
+            movie_system.load_similarity_matrix(args.similarity)
+            if args.als:
+                movie_system.load_als_model(args.als)
+                movie_system.set_prediction_engine('als')
+            if args.snapshot:
+                movie_system.save_snapshot(args.snapshot)
+        for batch_file in args.batch:
+            movie_system.load_batch_recommendations(batch_file)
+        RecommendationServer(movie_system, args.host, args.port, args.workers, args.executor).run()
+        raise SystemExit
+
     movie_system = MovieRecommendationSystem()
     user_auth = UserAuthentication(movie_system)
 
-    
-    movie_system.load_movie_data('data.csv')
-    movie_system.load_user_data('user.csv')
-    movie_system.load_user_ratings('ratings.csv')
+    def load_data():
+        movie_system.load_movie_data('data.csv')
+        movie_system.load_user_data('user.csv')
+        movie_system.load_user_ratings('ratings.csv')
 
-    app = MovieRecommendationUI(movie_system)
+    # The window opens straight away; the data loads in the background
+    app = MovieRecommendationUI(movie_system, load_data)
     app.run()
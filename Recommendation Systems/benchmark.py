@@ -0,0 +1,255 @@
+# Benchmarks for RS.py on synthetic data sets shaped like data.csv / user.csv / ratings.csv.
+#
+#     python benchmark.py --users 10000 --movies 2000 --output benchmark.json
+#     python benchmark.py --users 1000000 --movies 100000 --data-dir bench_1m --sample-users 500
+#
+# Every benchmark reports latency percentiles, throughput and the peak memory allocated by
+# one extra, traced call (run in-process, so work normally done by pool workers is counted);
+# the whole run is saved as JSON.
+import numpy as np
+import pandas as pd
+import argparse
+import json
+import os
+import platform
+import time
+import tracemalloc
+try:
+    import resource
+except ImportError:  # Not available on Windows; max RSS is then left out
+    resource = None
+
+from RS import MovieRecommendationSystem, UserAuthentication
+
+GENRES = ['Action', 'Adventure', 'Animation', 'Comedy', 'Crime', 'Drama', 'Fantasy', 'Horror', 'Romance', 'Sci-Fi',
+          'Thriller', 'War']
+WIDE_RATINGS_LIMIT = 5_000_000  # Above this many user x movie cells the ratings are written in long format
+
+
+def generate_dataset(directory, num_users, num_movies, ratings_per_user=20, ratings_format='auto', popularity=0.8,
+                     seed=0, chunk_size=100_000):
+    # Writes data.csv, user.csv and ratings.csv into directory. Movie popularity follows a
+    # power law (a few blockbusters, a long tail) and the number of ratings per user is
+    # log-normal around ratings_per_user, so the matrix is as sparse and skewed as real data.
+    os.makedirs(directory, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    if ratings_format == 'auto':
+        ratings_format = 'wide' if num_users * num_movies <= WIDE_RATINGS_LIMIT else 'long'
+
+    weights = 1.0 / np.arange(1, num_movies + 1) ** popularity
+    weights = weights[rng.permutation(num_movies)]  # Popular movies are spread over the id range
+    weights /= weights.sum()
+
+    with open(os.path.join(directory, 'data.csv'), 'w') as file:
+        file.write(',title,Genre,release_year,view,rating\n')
+        for start in range(0, num_movies, chunk_size):
+            ids = np.arange(start + 1, min(start + chunk_size, num_movies) + 1)
+            pd.DataFrame({
+                'id': ids,
+                'title': [f"Movie {movie_id}" for movie_id in ids],
+                'genre': rng.choice(GENRES, len(ids)),
+                'release_year': rng.integers(1950, 2025, len(ids)),
+                'view': (weights[ids - 1] * num_users * 50).astype(np.int64) + rng.integers(0, 100, len(ids)),
+                'rating': np.round(rng.uniform(1.0, 5.0, len(ids)), 1),
+            }).to_csv(file, header=False, index=False)
+
+    with open(os.path.join(directory, 'user.csv'), 'w') as file:
+        file.write('user_id,name,password,age,gender\n')
+        for start in range(0, num_users, chunk_size):
+            ids = np.arange(start + 1, min(start + chunk_size, num_users) + 1)
+            pd.DataFrame({
+                'user_id': ids,
+                'name': [f"User {user_id}" for user_id in ids],
+                'password': [f"pw{user_id}" for user_id in ids],
+                'age': rng.integers(16, 71, len(ids)),
+                'gender': rng.choice(['Male', 'Female'], len(ids)),
+            }).to_csv(file, header=False, index=False)
+
+    num_ratings = 0
+    with open(os.path.join(directory, 'ratings.csv'), 'w') as file:
+        if ratings_format == 'wide':
+            file.write(','.join(str(movie_id) for movie_id in range(num_movies + 1)) + '\n')
+        else:
+            file.write('user_id,movie_id,rating\n')
+        for start in range(0, num_users, chunk_size):
+            ids = np.arange(start + 1, min(start + chunk_size, num_users) + 1)
+            counts = np.clip(rng.lognormal(np.log(ratings_per_user), 0.8, len(ids)).astype(np.int64), 1, num_movies)
+            users = np.repeat(ids, counts)
+            movies = rng.choice(num_movies, len(users), p=weights) + 1
+            # Drop repeated (user, movie) draws
+            pairs = np.unique(users * (num_movies + 1) + movies)
+            users, movies = pairs // (num_movies + 1), pairs % (num_movies + 1)
+            ratings = rng.choice(np.arange(1, 6), len(pairs), p=[0.05, 0.1, 0.25, 0.35, 0.25])
+            num_ratings += len(pairs)
+
+            if ratings_format == 'wide':
+                dense = np.zeros((len(ids), num_movies + 1), dtype=np.int64)
+                dense[:, 0] = ids
+                dense[users - ids[0], movies] = ratings
+                np.savetxt(file, dense, fmt='%d', delimiter=',')
+            else:
+                np.savetxt(file, np.column_stack([users, movies, ratings]), fmt='%d', delimiter=',')
+
+    return {
+        'users': num_users,
+        'movies': num_movies,
+        'ratings': num_ratings,
+        'density': num_ratings / (num_users * num_movies),
+        'ratings_format': ratings_format,
+        'seed': seed,
+    }
+
+
+def measure(func, calls, traced=None):
+    # Times func(*args) for every args in calls, then runs traced() (default: the first call)
+    # once more under tracemalloc for its peak allocation. tracemalloc only sees this process,
+    # so work that runs on a process pool must be traced with a single, in-process worker.
+    latencies = []
+    started = time.perf_counter()
+    for args in calls:
+        start = time.perf_counter()
+        func(*args)
+        latencies.append(time.perf_counter() - start)
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    if traced is None:
+        func(*calls[0])
+    else:
+        traced()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    latencies = np.array(latencies) * 1000
+    return {
+        'calls': len(calls),
+        'mean_ms': float(latencies.mean()),
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p90_ms': float(np.percentile(latencies, 90)),
+        'p99_ms': float(np.percentile(latencies, 99)),
+        'max_ms': float(latencies.max()),
+        'throughput_per_s': len(calls) / elapsed if elapsed > 0 else float('inf'),
+        'peak_memory_bytes': peak,
+    }
+
+
+def run_benchmarks(directory, sample_users=1000, repeats=3, top_n=5, top_k=20, workers=None, seed=0, als_factors=20,
+                   als_iterations=5):
+    data_file = os.path.join(directory, 'data.csv')
+    user_file = os.path.join(directory, 'user.csv')
+    ratings_file = os.path.join(directory, 'ratings.csv')
+    neighbors_file = os.path.join(directory, 'movie_neighbors.bin')
+    batch_file = os.path.join(directory, 'recommendations.bin')
+    results = {}
+
+    def load_movies():
+        MovieRecommendationSystem().load_movie_data(data_file)
+
+    def load_users():
+        MovieRecommendationSystem().load_user_data(user_file)
+
+    def load_ratings():
+        MovieRecommendationSystem().load_user_ratings(ratings_file)
+
+    results['load_movie_data'] = measure(load_movies, [()] * repeats)
+    results['load_user_data'] = measure(load_users, [()] * repeats)
+    results['load_user_ratings'] = measure(load_ratings, [()] * repeats)
+
+    movie_system = MovieRecommendationSystem()
+    movie_system.load_movie_data(data_file)
+    movie_system.load_user_data(user_file)
+    movie_system.load_user_ratings(ratings_file)
+
+    def generate_similarity(workers=workers):
+        movie_system.generate_similarity_matrix(data_file, neighbors_file, top_k=top_k, workers=workers)
+
+    results['generate_similarity_matrix'] = measure(generate_similarity, [()] * repeats,
+                                                    traced=lambda: generate_similarity(workers=1))
+    movie_system.load_similarity_matrix(neighbors_file, top_k=5)
+
+    rng = np.random.default_rng(seed)
+    user_ids = list(movie_system.user_data)
+    sample = rng.choice(user_ids, min(sample_users, len(user_ids)), replace=False).tolist()
+    calls = [(user_id, top_n) for user_id in sample]
+    results['predict_user_ratings'] = measure(movie_system.predict_user_ratings, calls)
+    results['recommend_movies_based_on_similarity'] = measure(movie_system.recommend_movies_based_on_similarity, calls)
+    results['existing_user_recommendations'] = measure(movie_system.existing_user_recommendations, calls)
+    genders = [(movie_system.user_data[user_id]['gender'],) for user_id in sample]
+    results['get_gender_based_recommendations'] = measure(movie_system.get_gender_based_recommendations, genders)
+    results['new_user_recommendations'] = measure(movie_system.new_user_recommendations, [()] * len(sample))
+
+    def batch(workers=workers):
+        movie_system.batch_recommendations(batch_file, user_ids=sample, top_n=top_n, workers=workers)
+
+    results['batch_recommendations'] = measure(batch, [()] * repeats, traced=lambda: batch(workers=1))
+
+    def train_als():
+        movie_system.train_als_model(factors=als_factors, iterations=als_iterations, workers=workers)
+
+    results['train_als_model'] = measure(train_als, [()] * repeats)
+    movie_system.set_prediction_engine('als')
+    results['predict_user_ratings_als'] = measure(movie_system.predict_user_ratings, calls)
+    movie_system.set_prediction_engine('user_user')
+
+    user_auth = UserAuthentication(movie_system)
+    logins = [(movie_system.user_data[user_id]['name'], movie_system.user_data[user_id]['password']) for user_id in sample]
+    results['login_user'] = measure(user_auth.login_user, logins)
+    return results
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the movie recommendation system on synthetic data")
+    parser.add_argument('--users', type=int, default=10_000)
+    parser.add_argument('--movies', type=int, default=2_000)
+    parser.add_argument('--ratings-per-user', type=int, default=20)
+    parser.add_argument('--ratings-format', choices=['auto', 'wide', 'long'], default='auto')
+    parser.add_argument('--data-dir', default=None, help="Where the data set is written (default: bench_<users>x<movies>)")
+    parser.add_argument('--reuse', action='store_true', help="Benchmark the existing data set in --data-dir")
+    parser.add_argument('--sample-users', type=int, default=1000, help="Users timed per recommendation benchmark")
+    parser.add_argument('--repeats', type=int, default=3, help="Runs of the loaders and the similarity build")
+    parser.add_argument('--top-n', type=int, default=5)
+    parser.add_argument('--top-k', type=int, default=20, help="Neighbours per movie for generate_similarity_matrix")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--als-factors', type=int, default=20)
+    parser.add_argument('--als-iterations', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='benchmark.json')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    data_dir = args.data_dir or f"bench_{args.users}x{args.movies}"
+    dataset = {'directory': data_dir}
+    if not args.reuse:
+        print(f"Generating {args.users} users x {args.movies} movies in {data_dir}...")
+        dataset.update(generate_dataset(data_dir, args.users, args.movies, args.ratings_per_user, args.ratings_format,
+                                        seed=args.seed))
+
+    results = run_benchmarks(data_dir, sample_users=args.sample_users, repeats=args.repeats, top_n=args.top_n,
+                             top_k=args.top_k, workers=args.workers, seed=args.seed, als_factors=args.als_factors,
+                             als_iterations=args.als_iterations)
+    report = {
+        'dataset': dataset,
+        'environment': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+        },
+        'results': results,
+    }
+    if resource is not None:
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS
+        unit = 1 if platform.system() == 'Darwin' else 1024
+        report['max_rss_bytes'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit
+        # Largest pool worker (similarity build, batch job)
+        report['children_max_rss_bytes'] = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * unit
+
+    with open(args.output, 'w') as file:
+        json.dump(report, file, indent=2)
+    for name, result in results.items():
+        print(f"{name:40s} p50 {result['p50_ms']:9.2f} ms  p99 {result['p99_ms']:9.2f} ms  "
+              f"{result['throughput_per_s']:10.1f}/s  peak {result['peak_memory_bytes'] / 2 ** 20:8.1f} MiB")
+    print(f"Results saved to {args.output}")
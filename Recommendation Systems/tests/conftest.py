@@ -0,0 +1,55 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    # A small random catalog, user list and wide ratings file in the shipped CSV layouts
+    rng = np.random.default_rng(0)
+    num_movies, num_users = 60, 40
+    pd.DataFrame({
+        '': np.arange(1, num_movies + 1),
+        'title': [f"Movie {movie_id}" for movie_id in range(1, num_movies + 1)],
+        'Genre': rng.choice(['Action', 'Drama', 'Comedy', 'Horror'], num_movies),
+        'release_year': rng.integers(1970, 2024, num_movies),
+        'view': rng.integers(0, 5000, num_movies),
+        'rating': np.round(rng.uniform(1, 5, num_movies), 1),
+    }).to_csv(tmp_path / 'data.csv', index=False)
+    pd.DataFrame({
+        'user_id': np.arange(1, num_users + 1),
+        'name': [f"User {user_id}" for user_id in range(1, num_users + 1)],
+        'password': [f"pw{user_id}" for user_id in range(1, num_users + 1)],
+        'age': rng.integers(16, 70, num_users),
+        'gender': rng.choice(['Male', 'Female'], num_users),
+    }).to_csv(tmp_path / 'user.csv', index=False)
+    ratings = rng.integers(1, 6, (num_users, num_movies)) * (rng.random((num_users, num_movies)) < 0.2)
+    wide = np.column_stack([np.arange(1, num_users + 1), ratings])
+    header = ','.join(str(column) for column in range(num_movies + 1))
+    np.savetxt(tmp_path / 'ratings.csv', wide, fmt='%d', delimiter=',', header=header, comments='')
+    return tmp_path
+
+
+@pytest.fixture
+def movie_system(dataset, monkeypatch):
+    from RS import MovieRecommendationSystem
+    monkeypatch.chdir(dataset)
+    movie_system = MovieRecommendationSystem()
+    movie_system.load_movie_data('data.csv')
+    movie_system.load_user_data('user.csv')
+    movie_system.load_user_ratings('ratings.csv')
+    return movie_system
+
+
+@pytest.fixture
+def profileless_ratings(dataset, monkeypatch):
+    # Users 1-2 have profiles; user 3 only has a rating (movie 4 -> 2) in the long ratings file
+    monkeypatch.chdir(dataset)
+    (dataset / 'user.csv').write_text('user_id,name,password,age,gender\n1,a,pw,20,Male\n2,b,pw,30,Female\n')
+    (dataset / 'ratings.csv').write_text('user_id,movie_id,rating\n1,1,5\n2,2,4\n3,4,2\n')
+    return dataset
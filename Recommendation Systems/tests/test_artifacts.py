@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+
+from RS import ItemNeighborIndex, convert_similarity_file, create_artifact, is_artifact, open_artifact, write_artifact
+
+
+def test_artifact_round_trip(tmp_path):
+    arrays = {
+        'ids': np.arange(7, dtype=np.int64),
+        'matrix': np.random.default_rng(0).random((7, 3)).astype(np.float32),
+        'flags': np.array([1, 0, 1], dtype=np.uint8),
+        'empty': np.empty((0, 4), dtype=np.int32),
+    }
+    path = tmp_path / 'arrays.bin'
+    write_artifact(str(path), 'test', arrays, meta={'answer': 42})
+
+    assert is_artifact(str(path))
+    meta, loaded = open_artifact(str(path), kind='test')
+    assert meta == {'answer': 42}
+    assert loaded.keys() == arrays.keys()
+    for name, array in arrays.items():
+        assert loaded[name].dtype == array.dtype
+        assert loaded[name].shape == array.shape
+        np.testing.assert_array_equal(loaded[name], array)
+
+
+def test_open_artifact_rejects_other_kinds_and_files(tmp_path):
+    path = tmp_path / 'arrays.bin'
+    write_artifact(str(path), 'test', {'ids': np.arange(3)})
+    with pytest.raises(ValueError):
+        open_artifact(str(path), kind='item_neighbors')
+
+    text = tmp_path / 'plain.csv'
+    text.write_text('movie_id,neighbor_id,score\n')
+    assert not is_artifact(str(text))
+    with pytest.raises(ValueError):
+        open_artifact(str(text))
+
+
+def test_rewrite_keeps_open_mappings_intact(tmp_path):
+    path = str(tmp_path / 'neighbors.bin')
+    scores = np.random.default_rng(2).random((5000, 10)).astype(np.float32)
+    write_artifact(path, 'item_neighbors', {'movie_ids': np.arange(5000), 'neighbors': np.zeros((5000, 10), np.int32),
+                                            'scores': scores})
+    index = ItemNeighborIndex.load(path)
+
+    # A smaller catalog written to the same path, as a nightly rebuild would
+    write_artifact(path, 'item_neighbors', {'movie_ids': np.arange(3), 'neighbors': np.zeros((3, 2), np.int32),
+                                            'scores': np.ones((3, 2), np.float32)})
+    np.testing.assert_array_equal(index.scores[-1], scores[-1])
+    assert ItemNeighborIndex.load(path).scores.shape == (3, 2)
+    assert sorted(item.name for item in tmp_path.iterdir()) == ['neighbors.bin']
+
+
+def test_failed_write_keeps_the_old_artifact(tmp_path):
+    path = str(tmp_path / 'arrays.bin')
+    write_artifact(path, 'test', {'ids': np.arange(3)})
+    with pytest.raises(RuntimeError):
+        with create_artifact(path, 'test', {'ids': (np.int64, (10,))}) as arrays:
+            arrays['ids'][:] = 7
+            raise RuntimeError("interrupted")
+    np.testing.assert_array_equal(open_artifact(path, kind='test')[1]['ids'], np.arange(3))
+    assert sorted(item.name for item in tmp_path.iterdir()) == ['arrays.bin']
+
+
+def test_neighbor_index_binary_matches_csv(tmp_path):
+    rng = np.random.default_rng(1)
+    movie_ids = np.arange(1, 21)
+    similarities = rng.random((20, 20))
+    similarities = (similarities + similarities.T) / 2
+    np.fill_diagonal(similarities, 1.0)
+    header = 'id,' + ','.join(str(movie_id) for movie_id in movie_ids)
+    rows = np.column_stack([movie_ids, similarities])
+    np.savetxt(tmp_path / 'similarity.csv', rows, fmt=['%d'] + ['%.6f'] * 20, delimiter=',', header=header, comments='')
+
+    from_csv = ItemNeighborIndex.from_file(str(tmp_path / 'similarity.csv'), top_k=5)
+    convert_similarity_file(str(tmp_path / 'similarity.csv'), str(tmp_path / 'neighbors.bin'), top_k=5)
+    from_binary = ItemNeighborIndex.from_file(str(tmp_path / 'neighbors.bin'))
+
+    np.testing.assert_array_equal(from_binary.movie_ids, from_csv.movie_ids)
+    np.testing.assert_array_equal(from_binary.neighbors, from_csv.neighbors)
+    np.testing.assert_array_equal(from_binary.scores, from_csv.scores)
+    assert from_binary.top_k == 5
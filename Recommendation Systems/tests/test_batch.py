@@ -0,0 +1,52 @@
+import numpy as np
+
+from RS import BatchRecommendations, write_artifact
+
+
+def test_batch_round_trip(movie_system):
+    user_ids = list(movie_system.user_data)[::-3]  # Unsorted, as --users may list them
+    movie_system.batch_recommendations('batch.bin', user_ids=user_ids, top_n=4, shard_size=5, workers=1)
+    batch = BatchRecommendations.load('batch.bin')
+    assert batch.method == 'predict_user_ratings' and batch.top_n == 4
+
+    expected = movie_system.recommend_movie_ids(user_ids, 'predict_user_ratings', 4)
+    for user_id, (movie_ids, scores) in zip(user_ids, expected):
+        found_ids, found_scores = batch.lookup(user_id)
+        np.testing.assert_array_equal(found_ids, movie_ids)
+        np.testing.assert_allclose(found_scores, scores, rtol=1e-6)
+    assert batch.lookup(0) is None
+    assert batch.lookup(max(movie_system.user_data) + 1) is None
+
+
+def test_get_recommendations_answers_from_the_batch(movie_system):
+    user_id = next(iter(movie_system.user_data))
+    movie_system.batch_recommendations('batch.bin', top_n=3, workers=1)
+    movie_system.load_batch_recommendations('batch.bin')
+    batch = movie_system.precomputed['predict_user_ratings']
+    # Replace the stored answer so that it can only come from the file
+    row = batch._row(user_id)
+    batch.movie_ids = np.array(batch.movie_ids)
+    other = [movie_id for movie_id in movie_system.movies if movie_id not in batch.movie_ids[row]][:3]
+    batch.movie_ids[row] = other
+
+    recommendations = movie_system.get_recommendations(user_id, 'based_predict_user_ratings', 2)
+    assert [int(movie['id']) for movie in recommendations] == other[:2]
+    # More movies than the file holds, or a user whose ratings changed, are computed live
+    live = movie_system.predict_user_ratings(user_id, 4)
+    assert movie_system.get_recommendations(user_id, 'based_predict_user_ratings', 4) == live
+    movie_system.rate_movie(user_id, other[0], 5)
+    assert movie_system.get_recommendations(user_id, 'based_predict_user_ratings', 2) == \
+        movie_system.predict_user_ratings(user_id, 2)
+
+
+def test_lookup_in_files_with_unsorted_user_ids(tmp_path):
+    path = str(tmp_path / 'old.bin')
+    write_artifact(path, 'batch_recommendations', {
+        'user_ids': np.array([7, 3, 5], dtype=np.int64),
+        'movie_ids': np.array([[70, -1], [30, 31], [50, -1]], dtype=np.int64),
+        'scores': np.array([[7, 0], [3, 3.1], [5, 0]], dtype=np.float32),
+    }, meta={'method': 'predict_user_ratings', 'top_n': 2})
+    batch = BatchRecommendations.load(path)
+    assert batch.lookup(3)[0].tolist() == [30, 31]
+    assert batch.lookup(7)[0].tolist() == [70]
+    assert batch.lookup(4) is None
@@ -0,0 +1,69 @@
+import time
+
+import pytest
+
+from RS import RecommendationCache
+
+
+def test_lru_eviction_and_stats():
+    cache = RecommendationCache(maxsize=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1  # 'a' is now the most recently used
+    cache.put('c', 3)  # Evicts 'b'
+    assert cache.get('b') is None
+    assert cache.get('c') == 3
+    assert cache.stats() == {'size': 2, 'maxsize': 2, 'hits': 2, 'misses': 1, 'evictions': 1, 'expirations': 0,
+                             'hit_rate': pytest.approx(2 / 3)}
+
+    disabled = RecommendationCache(maxsize=0)
+    disabled.put('a', 1)
+    assert disabled.get('a') is None and disabled.stats()['size'] == 0
+
+
+def test_entries_expire_after_the_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, 'monotonic', lambda: now[0])
+    cache = RecommendationCache(maxsize=10, ttl=60)
+    cache.put('a', 1)
+    now[0] += 59
+    assert cache.get('a') == 1
+    now[0] += 2  # 61 s after the put; reads do not extend the lifetime
+    assert cache.get('a') is None
+    stats = cache.stats()
+    assert (stats['size'], stats['expirations'], stats['hits'], stats['misses']) == (0, 1, 1, 1)
+
+
+@pytest.fixture
+def cached_system(movie_system):
+    user_id = next(iter(movie_system.user_data))
+    movie_system.generate_similarity_matrix(None, 'neighbors.bin', top_k=5, workers=1)
+    movie_system.load_similarity_matrix('neighbors.bin')
+    return movie_system, user_id
+
+
+def cached_call(movie_system, user_id):
+    # Returns whether get_recommendations was answered from the cache
+    hits = movie_system.cache.hits
+    movie_system.get_recommendations(user_id, 'based_on_similarity', 5)
+    return movie_system.cache.hits > hits
+
+
+@pytest.mark.parametrize('change', ['rate_movie', 'add_movie', 'update_movie'])
+def test_data_changes_invalidate_cached_recommendations(cached_system, change):
+    movie_system, user_id = cached_system
+    movie_system.get_recommendations(user_id, 'based_on_similarity', 5)
+    assert cached_call(movie_system, user_id)
+
+    movie_id = next(iter(movie_system.movies))
+    if change == 'rate_movie':
+        movie_system.rate_movie(user_id, movie_id, 5)
+    elif change == 'add_movie':
+        movie_system.add_movie(1000, "New movie", 'Drama', 2000, rating=4.0)
+    else:
+        movie_system.update_movie(movie_id, view=10, rating=1.0)
+    assert not cached_call(movie_system, user_id)
+    assert cached_call(movie_system, user_id)
+    # The cached answer is the one computed after the change
+    assert movie_system.get_recommendations(user_id, 'based_on_similarity', 5) == \
+        movie_system.recommend_movies_based_on_similarity(user_id, 5)
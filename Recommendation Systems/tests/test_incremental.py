@@ -0,0 +1,95 @@
+import numpy as np
+
+from RS import ItemNeighborIndex, RatingMatrix
+
+
+def test_set_rating_matches_rebuild():
+    rng = np.random.default_rng(0)
+    dense = rng.integers(1, 6, (30, 25)) * (rng.random((30, 25)) < 0.3)
+    user_ids, movie_ids = np.arange(101, 131), np.arange(1, 26)
+    matrix = RatingMatrix(user_ids, movie_ids, dense.astype(np.float32))
+    matrix.user_similarities(101)  # Builds the cached squared / binary matrices that edits keep in sync
+
+    for step in range(300):
+        row, col = rng.integers(30), rng.integers(25)
+        rating = 0 if rng.random() < 0.3 else int(rng.integers(1, 6))  # Includes removals of stored and pending entries
+        matrix.set_rating(int(user_ids[row]), int(movie_ids[col]), rating)
+        dense[row, col] = rating
+        if step % 37 == 0:
+            matrix.user_similarities(int(user_ids[row]))  # Reads in between merge the pending entries
+
+    rebuilt = RatingMatrix(user_ids, movie_ids, dense.astype(np.float32))
+    np.testing.assert_array_equal(matrix.matrix.toarray(), dense)
+    assert matrix.matrix.nnz == np.count_nonzero(dense)
+    for user_id in user_ids:
+        np.testing.assert_allclose(matrix.user_similarities(int(user_id)), rebuilt.user_similarities(int(user_id)),
+                                   rtol=1e-5, atol=1e-6)
+        np.testing.assert_array_equal(matrix.dense_row(int(user_id)), rebuilt.dense_row(int(user_id)))
+
+
+def test_new_users_and_movies_extend_the_matrix():
+    matrix = RatingMatrix([1, 2], [10, 20], np.array([[5, 0], [0, 3]], dtype=np.float32))
+    matrix.add_user(3)
+    matrix.add_movie(30)
+    matrix.set_rating(3, 30, 4)
+    matrix.set_rating(1, 30, 2)
+    np.testing.assert_array_equal(matrix.matrix.toarray(), [[5, 0, 2], [0, 3, 0], [0, 0, 4]])
+
+
+def test_add_movie_matches_rebuild(movie_system, dataset):
+    movie_system.generate_similarity_matrix(None, str(dataset / 'before.bin'), top_k=5, workers=1)
+    movie_system.load_similarity_matrix(str(dataset / 'before.bin'))
+    # Year and rating inside the catalog's ranges, so a full rebuild scales every feature the same way
+    years = [movie['release_year'] for movie in movie_system.movies.values()]
+    movie_system.add_movie(1000, "New movie", 'Drama', int(np.median(years)), rating=3.3)
+
+    movie_system.generate_similarity_matrix(None, str(dataset / 'after.bin'), top_k=5, workers=1)
+    rebuilt = ItemNeighborIndex.load(str(dataset / 'after.bin'))
+    incremental = movie_system.item_neighbors
+
+    np.testing.assert_array_equal(incremental.movie_ids, rebuilt.movie_ids)
+    np.testing.assert_allclose(incremental.scores, rebuilt.scores, rtol=1e-5, atol=1e-6)
+    for row in range(len(rebuilt.movie_ids)):
+        # Equal scores may be listed in either order
+        assert set(incremental.neighbors[row]) == set(rebuilt.neighbors[row])
+
+
+def test_add_movie_keeps_the_build_scaling(movie_system, dataset):
+    movie_system.generate_similarity_matrix(None, str(dataset / 'before.bin'), top_k=5, workers=1)
+    movie_system.load_similarity_matrix(str(dataset / 'before.bin'))
+    before = ItemNeighborIndex.load(str(dataset / 'before.bin'))
+    movies = list(movie_system.movies.values())
+
+    # Features as the index was built: one-hot genre, min-max scaled year and rating of the old catalog
+    genres = sorted({movie['genre'] for movie in movies})
+    years = np.array([movie['release_year'] for movie in movies], dtype=float)
+    ratings = np.array([movie['rating'] for movie in movies], dtype=float)
+
+    def features(genre, year, rating):
+        return np.concatenate([[genre == name for name in genres],
+                               [(year - years.min()) / (years.max() - years.min()),
+                                (rating - ratings.min()) / (ratings.max() - ratings.min())]])
+
+    catalog = np.array([features(movie['genre'], movie['release_year'], movie['rating']) for movie in movies])
+    catalog /= np.linalg.norm(catalog, axis=1, keepdims=True)
+    new = features('Action', 2100, 5.0)  # Outside the year range
+    new /= np.linalg.norm(new)
+    expected = np.sort(catalog @ new)[::-1][:5]
+
+    new_row = len(before.movie_ids)
+    movie_system.add_movie(1000, "Far future", 'Action', 2100, rating=5.0)
+    after = movie_system.item_neighbors
+    np.testing.assert_allclose(after.scores[new_row], expected, rtol=1e-5)
+    for row in range(new_row):
+        kept = after.neighbors[row] != new_row
+        count = np.count_nonzero(kept)
+        # The new movie is spliced in; the old neighbours keep their order and scores
+        np.testing.assert_array_equal(after.neighbors[row][kept], before.neighbors[row][:count])
+        np.testing.assert_array_equal(after.scores[row][kept], before.scores[row][:count])
+
+    # The next movie is still scaled by the build's ranges, not by ranges that include year 2100
+    catalog = np.vstack([catalog, new])
+    second = features('Drama', int(np.median(years)), 3.0)
+    expected = np.sort(catalog @ (second / np.linalg.norm(second)))[::-1][:5]
+    movie_system.add_movie(1001, "Next", 'Drama', int(np.median(years)), rating=3.0)
+    np.testing.assert_allclose(movie_system.item_neighbors.scores[new_row + 1], expected, rtol=1e-5)
@@ -0,0 +1,71 @@
+import numpy as np
+
+from RS import UNKNOWN_RELEASE_YEAR, MovieRecommendationSystem, RatingMatrix, Storage
+
+
+def test_movie_loader_parses_quoted_titles_and_skips_invalid_rows(tmp_path, capsys):
+    path = tmp_path / 'data.csv'
+    path.write_text(',title,Genre,release_year,view,rating\n'
+                    '1,"Crouching Tiger, Hidden Dragon",Action,2000,10,4.5\n'
+                    '2,No year,Drama,,5,3.0\n'
+                    '3,Bad views,Drama,1999,many,3.0\n'
+                    ',No id,Drama,1999,1,1.0\n'
+                    '4,"Say ""hi""",Comedy,not a year,7,2.5\n')
+    progress = []
+    movie_system = MovieRecommendationSystem(storage=Storage())
+    movie_system.load_movie_data(str(path), chunk_size=2, progress=progress.append)
+
+    assert list(movie_system.movies) == [1, 2, 4]
+    assert movie_system.movies[1]['title'] == 'Crouching Tiger, Hidden Dragon'
+    assert movie_system.movies[1]['genre'] == 'Action'
+    assert movie_system.movies[4]['title'] == 'Say "hi"'
+    # A blank or invalid year keeps the movie, with an unknown year
+    assert movie_system.movies[2]['release_year'] == UNKNOWN_RELEASE_YEAR
+    assert movie_system.movies[4]['release_year'] == UNKNOWN_RELEASE_YEAR
+    assert progress == [2, 4, 5]
+    output = capsys.readouterr().out
+    assert "Skipping movie '3'" in output and 'No id' not in output
+
+
+def test_user_loader_skips_invalid_rows(tmp_path, capsys):
+    path = tmp_path / 'user.csv'
+    path.write_text('user_id,name,password,age,gender\n1,a,pw,20,Male\nx,b,pw,30,Female\n3,c,pw,old,Male\n4,d,pw,40,Female\n')
+    movie_system = MovieRecommendationSystem(storage=Storage())
+    movie_system.load_user_data(str(path))
+    assert list(movie_system.user_data) == [1, 4]
+    assert "Skipping user 'x'" in capsys.readouterr().out
+
+
+def test_long_ratings_later_lines_win_and_zero_removes(tmp_path):
+    path = tmp_path / 'ratings.csv'
+    path.write_text('user_id,movie_id,rating\n'
+                    '1,10,5\n2,10,3\n1,10,2\n'  # 1 -> 10 rated twice: the later line wins
+                    '2,20,4\n2,20,0\n'  # Removed again
+                    '3,30,1\n3,30,0\n3,30,4\n'  # Removed, then rated again
+                    '9,10,1\n')  # A user without a profile
+    progress = []
+    matrix = RatingMatrix.from_long_csv(str(path), user_ids=[1, 2, 3], movie_ids=[10, 20, 30], chunk_size=3,
+                                        progress=progress.append)
+    assert matrix.user_ids.tolist() == [1, 2, 3, 9]  # Known users first, then ids first seen in the file
+    np.testing.assert_array_equal(matrix.matrix.toarray(), [[2, 0, 0], [3, 0, 0], [0, 0, 4], [1, 0, 0]])
+    assert matrix.matrix.nnz == 4  # Removed pairs are not stored
+    assert progress == [3, 6, 9]
+
+    one_chunk = RatingMatrix.from_long_csv(str(path), user_ids=[1, 2, 3], movie_ids=[10, 20, 30])
+    np.testing.assert_array_equal(one_chunk.matrix.toarray(), matrix.matrix.toarray())
+
+
+def test_wide_ratings_report_progress_and_skip_bad_rows(tmp_path, capsys):
+    path = tmp_path / 'ratings.csv'
+    path.write_text('0,10,20,30\n1,5,0,3\n2,x,1,1\n3\n4,0,0,2\n5,1,1,1\n')
+    progress = []
+    movie_system = MovieRecommendationSystem(storage=Storage())
+    movie_system.load_user_ratings(str(path), chunk_size=2, progress=progress.append)
+
+    matrix = movie_system.rating_matrix
+    assert matrix.user_ids.tolist() == [1, 4, 5]
+    assert matrix.movie_ids.tolist() == [10, 20, 30]
+    np.testing.assert_array_equal(matrix.matrix.toarray(), [[5, 0, 3], [0, 0, 2], [1, 1, 1]])
+    assert progress == [2, 4, 5]
+    output = capsys.readouterr().out
+    assert 'Skipping line' in output and 'Skipping incomplete row' in output
@@ -0,0 +1,48 @@
+import pytest
+
+from RS import metrics
+
+
+@pytest.fixture
+def enabled_metrics():
+    metrics.reset()
+    metrics.enable()
+    yield metrics
+    metrics.disable()
+    metrics.reset()
+
+
+def test_scoring_paths_report_their_stages(movie_system, enabled_metrics):
+    movie_system.generate_similarity_matrix(None, 'neighbors.bin', top_k=5, workers=1)
+    movie_system.load_similarity_matrix('neighbors.bin')
+    movie_system.train_als_model(factors=4, iterations=2, workers=1)
+    user_id = next(iter(movie_system.user_data))
+    movie_system.predict_user_ratings(user_id)
+    movie_system.recommend_movies_based_on_similarity(user_id)
+    movie_system.set_prediction_engine('als')
+    movie_system.predict_user_ratings(user_id)
+
+    stages = enabled_metrics.snapshot()['stages']
+    for stage in ['user_user.similarity', 'user_user.neighbors', 'user_user.scoring', 'user_user.top_n',
+                  'item_item.scoring', 'item_item.top_n', 'als.scoring', 'als.top_n']:
+        assert stages[stage]['calls'] > 0, stage
+
+
+def test_batch_merges_worker_metrics(movie_system, enabled_metrics):
+    user_ids = list(movie_system.user_data)
+    movie_system.batch_recommendations('batch.bin', user_ids=user_ids, top_n=3, shard_size=10, workers=2)
+    stages = enabled_metrics.snapshot()['stages']
+    # Each shard is scored in one vectorised pass inside a pool process
+    assert stages['user_user.top_n']['calls'] == len(user_ids) // 10
+    assert stages['batch_recommendations']['calls'] == 1
+
+
+def test_merge_adds_counts_and_keeps_the_maximum(enabled_metrics):
+    enabled_metrics.record_stage('stage', 0.5)
+    enabled_metrics.count('hits', 2)
+    enabled_metrics.merge({'stages': {'stage': [2, 1.0, 0.75]}, 'counters': {'hits': 3, 'misses': 1},
+                           'values': {'size': [1, 10, 10]}})
+    snapshot = enabled_metrics.snapshot()
+    assert snapshot['stages']['stage'] == {'calls': 3, 'total_seconds': 1.5, 'max_seconds': 0.75}
+    assert snapshot['counters'] == {'hits': 5, 'misses': 1}
+    assert snapshot['values']['size'] == {'count': 1, 'sum': 10, 'max': 10}
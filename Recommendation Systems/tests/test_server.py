@@ -0,0 +1,74 @@
+import asyncio
+import json
+from http import HTTPStatus
+
+import pytest
+
+from RS import MovieRecommendationSystem, RecommendationServer
+
+
+@pytest.fixture
+def server(profileless_ratings):
+    # Users 1-2 have a profile and ratings, 3 only ratings, 4 only a profile
+    with open('user.csv', 'a') as file:
+        file.write('4,d,pw,40,Male\n')
+    movie_system = MovieRecommendationSystem()
+    movie_system.load_movie_data('data.csv')
+    movie_system.load_user_data('user.csv')
+    movie_system.load_user_ratings('ratings.csv')
+    server = RecommendationServer(movie_system, workers=2)
+    yield server
+    server.executor.shutdown()
+
+
+def get(server, path, **query):
+    return asyncio.run(server.handle('GET', path, {name: [str(value)] for name, value in query.items()}, b''))
+
+
+def post(server, path, payload):
+    body = payload if isinstance(payload, bytes) else json.dumps(payload).encode('utf-8')
+    return asyncio.run(server.handle('POST', path, {}, body))
+
+
+def test_single_user_routes(server):
+    status, payload = get(server, '/recommendations/based_existing_user_recommendations', user_id=1, top_n=3)
+    assert status == HTTPStatus.OK
+    assert payload['user_id'] == 1 and [movie['id'] for movie in payload['movies']] == ['1']
+
+    status, payload = get(server, '/recommendations/based_on_gender', user_id=1, top_n=8)
+    assert status == HTTPStatus.OK
+    assert payload['movies'] == server.movie_system.get_gender_based_recommendations('Male', 8)
+    assert len(payload['movies']) > 5  # top_n is honoured beyond the old fixed five
+
+    assert get(server, '/recommendations/based_on_similarity', user_id=99)[0] == HTTPStatus.NOT_FOUND
+    assert get(server, '/recommendations/unknown', user_id=1)[0] == HTTPStatus.NOT_FOUND
+    assert get(server, '/recommendations/based_on_gender', user_id='x')[0] == HTTPStatus.BAD_REQUEST
+    assert get(server, '/recommendations/based_on_gender')[0] == HTTPStatus.BAD_REQUEST
+    for top_n in (0, -1):
+        status, payload = get(server, '/recommendations/based_predict_user_ratings', user_id=1, top_n=top_n)
+        assert status == HTTPStatus.BAD_REQUEST and 'top_n' in payload['error']
+
+
+def test_users_missing_a_profile_or_ratings(server):
+    # Ratings but no profile: rating-based types work, gender has nothing to go on
+    assert get(server, '/recommendations/based_existing_user_recommendations', user_id=3)[0] == HTTPStatus.OK
+    status, payload = get(server, '/recommendations/based_on_gender', user_id=3)
+    assert status == HTTPStatus.NOT_FOUND and '3' in payload['error']
+    # A profile but no ratings: gender works, and the loader gives the user an empty ratings row
+    assert get(server, '/recommendations/based_on_gender', user_id=4)[0] == HTTPStatus.OK
+    status, payload = get(server, '/recommendations/based_existing_user_recommendations', user_id=4)
+    assert status == HTTPStatus.OK and payload['movies'] == []
+
+
+def test_batch_route(server):
+    status, payload = post(server, '/recommendations/based_on_gender/batch', {'user_ids': [1, 2, 4], 'top_n': 2})
+    assert status == HTTPStatus.OK
+    assert list(payload['results']) == ['1', '2', '4']
+    assert payload['results']['2'] == server.movie_system.get_gender_based_recommendations('Female', 2)
+
+    status, payload = post(server, '/recommendations/based_on_gender/batch', {'user_ids': [1, 3]})
+    assert status == HTTPStatus.NOT_FOUND and '3' in payload['error']
+    assert post(server, '/recommendations/based_on_gender/batch', {'user_ids': [1], 'top_n': 0})[0] == HTTPStatus.BAD_REQUEST
+    assert post(server, '/recommendations/based_on_gender/batch', {})[0] == HTTPStatus.BAD_REQUEST
+    assert post(server, '/recommendations/based_on_gender/batch', b'not json')[0] == HTTPStatus.BAD_REQUEST
+    assert get(server, '/recommendations/based_on_gender/batch')[0] == HTTPStatus.NOT_FOUND
@@ -0,0 +1,101 @@
+import os
+
+import numpy as np
+import pytest
+
+from RS import MovieRecommendationSystem, SQLiteStorage, open_artifact
+
+
+def recommendations(movie_system):
+    return {user_id: ([movie['id'] for movie in movie_system.predict_user_ratings(user_id)],
+                      [movie['id'] for movie in movie_system.recommend_movies_based_on_similarity(user_id)],
+                      [movie['id'] for movie in movie_system.existing_user_recommendations(user_id)])
+            for user_id in movie_system.user_data}
+
+
+def test_snapshot_round_trip(movie_system, dataset):
+    movie_system.generate_similarity_matrix(None, 'neighbors.bin', top_k=5, workers=1)
+    movie_system.load_similarity_matrix('neighbors.bin')
+    movie_system.train_als_model(factors=4, iterations=2, workers=1)
+    movie_system.save_snapshot('snapshot.bin')
+
+    restored = MovieRecommendationSystem()
+    restored.restore_snapshot('snapshot.bin')
+    assert restored.movies == movie_system.movies
+    assert restored.user_data == movie_system.user_data
+    assert restored.users.name_index == movie_system.users.name_index
+    assert restored.users.next_id == movie_system.users.next_id
+    np.testing.assert_array_equal(restored.rating_matrix.matrix.toarray(), movie_system.rating_matrix.matrix.toarray())
+    np.testing.assert_array_equal(restored.item_neighbors.neighbors, movie_system.item_neighbors.neighbors)
+    np.testing.assert_array_equal(restored.als_model.item_factors, movie_system.als_model.item_factors)
+    assert recommendations(restored) == recommendations(movie_system)
+
+    # The restored rating matrix is a writable copy, not the read-only mapping
+    user_id, movie_id = next(iter(restored.user_data)), next(iter(restored.movies))
+    restored.rate_movie(user_id, movie_id, 5)
+    assert restored.rating_matrix.dense_row(user_id)[restored.rating_matrix.movie_index[movie_id]] == 5
+
+
+def test_restored_snapshot_saves_over_its_own_file(movie_system, dataset):
+    movie_system.generate_similarity_matrix(None, 'neighbors.bin', top_k=5, workers=1)
+    movie_system.load_similarity_matrix('neighbors.bin')
+    movie_system.train_als_model(factors=4, iterations=2, workers=1)
+    movie_system.save_snapshot('snapshot.bin')
+    expected = recommendations(movie_system)
+
+    restored = MovieRecommendationSystem()
+    restored.restore_snapshot('snapshot.bin')  # Maps its arrays from snapshot.bin
+    restored.save_snapshot('snapshot.bin')
+    # A second instance rebuilding the same file must not pull the data out from under the first
+    MovieRecommendationSystem().save_snapshot('snapshot.bin')
+    assert recommendations(restored) == expected
+
+    restored.save_snapshot('snapshot.bin')
+    again = MovieRecommendationSystem()
+    again.restore_snapshot('snapshot.bin')
+    assert recommendations(again) == expected
+
+
+def test_snapshot_rejects_changed_sources(movie_system, dataset):
+    movie_system.save_snapshot('snapshot.bin')
+    stat = os.stat('data.csv')
+    os.utime('data.csv', ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    with pytest.raises(ValueError, match='stale'):
+        MovieRecommendationSystem().restore_snapshot('snapshot.bin')
+
+
+def test_snapshot_rejects_corruption(movie_system, dataset):
+    movie_system.save_snapshot('snapshot.bin')
+    meta, arrays = open_artifact('snapshot.bin', kind='snapshot', mode='r+')
+    arrays['ratings_data'][0] += 1  # A flipped rating, written behind the checksum's back
+    arrays['ratings_data'].flush()
+    del arrays
+    with pytest.raises(ValueError, match='corrupt'):
+        MovieRecommendationSystem().restore_snapshot('snapshot.bin')
+
+
+def test_snapshot_rejects_other_requested_sources(movie_system, dataset):
+    movie_system.save_snapshot('snapshot.bin')
+    with pytest.raises(ValueError, match='als_model'):
+        MovieRecommendationSystem().restore_snapshot('snapshot.bin', sources={'als_model': 'als.bin'})
+    MovieRecommendationSystem().restore_snapshot('snapshot.bin', sources={'movies': 'data.csv', 'als_model': None})
+
+
+def test_database_snapshot_survives_reopening(dataset, monkeypatch):
+    monkeypatch.chdir(dataset)
+    storage = SQLiteStorage('test.db')
+    storage.import_csv()
+    movie_system = MovieRecommendationSystem(storage=storage)
+    movie_system.load_from_storage()
+    movie_system.save_snapshot('snapshot.bin')
+    storage.close()  # Checkpoints and removes the WAL file
+
+    reopened = MovieRecommendationSystem(storage=SQLiteStorage('test.db'))
+    reopened.restore_snapshot('snapshot.bin', sources={'database': 'test.db'})
+    assert reopened.user_data == movie_system.user_data
+
+    reopened.rate_movie(next(iter(reopened.user_data)), next(iter(reopened.movies)), 1)
+    reopened.storage.flush()
+    with pytest.raises(ValueError, match='stale'):
+        MovieRecommendationSystem().restore_snapshot('snapshot.bin')
+    reopened.storage.close()
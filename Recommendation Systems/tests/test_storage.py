@@ -0,0 +1,44 @@
+import pytest
+
+from RS import MovieRecommendationSystem, SQLiteStorage, UserAuthentication
+
+
+def open_database(file_path='test.db'):
+    movie_system = MovieRecommendationSystem(storage=SQLiteStorage(file_path))
+    movie_system.load_from_storage()
+    return movie_system
+
+
+def test_database_ids_skip_users_that_only_have_ratings(profileless_ratings):
+    storage = SQLiteStorage('test.db')
+    storage.import_csv()
+    storage.close()
+
+    first, second = open_database(), open_database()
+    UserAuthentication(first).register_user('c', 'pw', 25, 'Female')
+    UserAuthentication(second).register_user('d', 'pw', 35, 'Male')
+    assert (first.logged_in_user, second.logged_in_user) == (4, 5)
+    assert len(first.rating_matrix.user_row(4)[0]) == 0
+    first.storage.close()
+    second.storage.close()
+
+    reopened = open_database()
+    assert {user_id: user['name'] for user_id, user in reopened.user_data.items()} == {1: 'a', 2: 'b', 4: 'c', 5: 'd'}
+    assert len(reopened.rating_matrix.user_row(4)[0]) == 0
+    assert reopened.rating_matrix.user_row(3)[1].tolist() == [2.0]
+    reopened.storage.close()
+
+
+def test_database_rejects_duplicate_names(profileless_ratings):
+    storage = SQLiteStorage('test.db')
+    storage.import_csv()
+    storage.close()
+
+    first, second = open_database(), open_database()
+    UserAuthentication(first).register_user('c', 'pw', 25, 'Female')
+    with pytest.raises(ValueError, match='already exists'):
+        # Not known to the second process yet, so only the database can catch it
+        UserAuthentication(second).register_user('c', 'other', 40, 'Male')
+    assert 'c' not in [user['name'] for user in second.user_data.values()]
+    first.storage.close()
+    second.storage.close()
@@ -0,0 +1,39 @@
+import pytest
+
+from RS import MovieRecommendationSystem, Storage, UserAuthentication
+
+
+def load(movie_system):
+    movie_system.load_movie_data('data.csv')
+    movie_system.load_user_data('user.csv')
+    movie_system.load_user_ratings('ratings.csv')
+    return movie_system
+
+
+def test_registration_skips_ids_that_only_have_ratings(profileless_ratings):
+    movie_system = load(MovieRecommendationSystem())
+    user_auth = UserAuthentication(movie_system)
+    user_auth.register_user('c', 'pw', 25, 'Female')
+
+    user_id = movie_system.logged_in_user
+    assert user_id == 4
+    assert len(movie_system.rating_matrix.user_row(user_id)[0]) == 0
+    assert movie_system.rating_matrix.user_row(3)[1].tolist() == [2.0]
+
+    movie_system.storage.flush()
+    reloaded = load(MovieRecommendationSystem())
+    assert reloaded.user_data[4]['name'] == 'c'
+    assert len(reloaded.rating_matrix.user_row(4)[0]) == 0
+
+
+class StaleIdStorage(Storage):
+    # Hands out an id that already has a ratings row, as an out-of-sync store would
+    def create_user(self, user_info, user_id):
+        return 3
+
+
+def test_registration_refuses_to_adopt_a_ratings_row(profileless_ratings):
+    movie_system = load(MovieRecommendationSystem(storage=StaleIdStorage()))
+    with pytest.raises(ValueError, match='already has a rating row'):
+        UserAuthentication(movie_system).register_user('c', 'pw', 25, 'Female')
+    assert movie_system.rating_matrix.user_row(3)[1].tolist() == [2.0]